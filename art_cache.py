@@ -0,0 +1,253 @@
+import gi
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import GLib, GdkPixbuf
+import hashlib
+import http.client
+import itertools
+import os
+import queue
+import threading
+import urllib.parse
+from collections import OrderedDict
+
+ART_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dashboard", "art")
+
+# The most the on-disk art cache may hold. The least recently used files are
+# deleted once it grows past this.
+ART_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# How many ready-to-draw covers are kept in memory.
+ART_MEMORY_CACHE_SIZE = 32
+
+# The number of threads downloading and decoding art.
+ART_FETCH_WORKERS = 2
+ART_FETCH_CHUNK = 16 * 1024
+ART_FETCH_TIMEOUT = 10
+ART_MAX_REDIRECTS = 3
+
+# The file an art URL is cached in.
+def art_cache_path(url):
+    return os.path.join(ART_CACHE_DIR, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+# Returns the cached file for an art URL, or None. A hit refreshes the file's
+# modification time, which is what the size cap evicts by.
+def cached_art_file(url):
+    path = art_cache_path(url)
+    try:
+        os.utime(path)
+        return path
+    except OSError:
+        return None
+
+# Stores downloaded art in the cache and returns its path. The file is
+# written under a temporary name and renamed, so a reader never sees half of it.
+def store_art(url, data):
+    os.makedirs(ART_CACHE_DIR, exist_ok=True)
+    path = art_cache_path(url)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    trim_art_cache()
+    return path
+
+# Deletes the least recently used files until the cache fits its size cap.
+def trim_art_cache(max_bytes=ART_CACHE_MAX_BYTES):
+    try:
+        entries = []
+        with os.scandir(ART_CACHE_DIR) as it:
+            for entry in it:
+                if entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError as e:
+        print(f"Error reading art cache: {e}")
+        return
+
+    total = sum(size for mtime, size, path in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= max_bytes: break
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError as e:
+            print(f"Error trimming art cache '{path}': {e}")
+
+# A least-recently-used map of art URLs to covers that have already been
+# cropped and scaled into textures, so showing one again is just a draw.
+class ArtMemoryCache:
+    def __init__(self, capacity=ART_MEMORY_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+
+    # Returns the cached cover for a URL, or None.
+    def get(self, url):
+        image = self.entries.get(url)
+        if image is not None:
+            self.entries.move_to_end(url)
+        return image
+
+    # Caches a cover, evicting the least recently used ones beyond the capacity.
+    def put(self, url, image):
+        self.entries[url] = image
+        self.entries.move_to_end(url)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+# Raised inside a worker when the request it is serving has been cancelled.
+class FetchCancelled(Exception):
+    pass
+
+# A queued art request. Requests with a lower priority number are served
+# first. Images are decoded so that their shorter side is `size` pixels.
+class ArtRequest:
+    def __init__(self, url, callback, is_cancelled, size, priority):
+        self.url = url
+        self.callback = callback
+        self.is_cancelled = is_cancelled
+        self.size = size
+        self.priority = priority
+
+# Downloads and decodes art on a small, fixed pool of threads. Each thread
+# keeps one HTTP connection per host alive between requests, and the bytes
+# are streamed straight into a GdkPixbuf.PixbufLoader as they arrive, then
+# written to the disk cache. Local file:// art goes through the same loader,
+# and every image is decoded at the requested size rather than in full. A
+# request whose `is_cancelled()` turns true is dropped before it starts or
+# between chunks, and its callback never runs, so a stale cover can't land
+# after the current one.
+class ArtFetcher:
+    def __init__(self, workers=ART_FETCH_WORKERS):
+        self.worker_count = workers
+        self.requests = queue.PriorityQueue()
+        self.counter = itertools.count()
+        self.workers = []
+        self.local = threading.local()
+
+    # Queues a request. `callback(pixbuf)` is called on the main thread with
+    # the decoded image, or None if it couldn't be loaded.
+    def fetch(self, url, callback, is_cancelled, size=None, priority=0):
+        request = ArtRequest(url, callback, is_cancelled, size, priority)
+        self.requests.put((priority, next(self.counter), request))
+        if not self.workers:
+            for _ in range(self.worker_count):
+                worker = threading.Thread(target=self._fetch_worker, daemon=True)
+                worker.start()
+                self.workers.append(worker)
+
+    # Runs in each pool thread, serving one request at a time.
+    def _fetch_worker(self):
+        self.local.connections = {}
+        while True:
+            priority, order, request = self.requests.get()
+            if request.is_cancelled(): continue
+            try:
+                pixbuf = self.load(request)
+            except FetchCancelled:
+                continue
+            except Exception as e:
+                print(f"Error downloading or processing image from URL '{request.url}': {e}")
+                pixbuf = None
+            GLib.idle_add(self._deliver, request, pixbuf)
+
+    # Hands a result to its requester, unless it was cancelled meanwhile.
+    def _deliver(self, request, pixbuf):
+        if not request.is_cancelled():
+            request.callback(pixbuf)
+        return GLib.SOURCE_REMOVE
+
+    # Loads a request's image from a local file or the disk cache, or
+    # downloads it.
+    def load(self, request):
+        if request.url.startswith('file://'):
+            path = GLib.filename_from_uri(request.url)[0]
+        else:
+            path = cached_art_file(request.url)
+        if path is None:
+            return self.download(request, request.url, ART_MAX_REDIRECTS)
+        with open(path, 'rb') as f:
+            return self.decode(request, lambda: f.read(ART_FETCH_CHUNK))
+
+    # Feeds chunks from `read_chunk()` into a pixbuf loader until it returns
+    # nothing, checking for cancellation in between. Read chunks are also
+    # collected into `chunks` if given.
+    def decode(self, request, read_chunk, chunks=None):
+        loader = GdkPixbuf.PixbufLoader()
+        if request.size:
+            loader.connect("size-prepared", self.on_size_prepared, request.size)
+        try:
+            while True:
+                if request.is_cancelled():
+                    raise FetchCancelled()
+                chunk = read_chunk()
+                if not chunk: break
+                loader.write(chunk)
+                if chunks is not None:
+                    chunks.append(chunk)
+        finally:
+            try: loader.close()
+            except GLib.Error: pass
+
+        pixbuf = loader.get_pixbuf()
+        if pixbuf is None:
+            raise OSError("not an image")
+        return pixbuf
+
+    # Scales an image down while it is decoded, so its shorter side is the
+    # requested size. Smaller images are left as they are.
+    def on_size_prepared(self, loader, width, height, size):
+        scale = size / min(width, height) if width and height else 1
+        if scale < 1:
+            loader.set_size(max(1, round(width * scale)), max(1, round(height * scale)))
+
+    # Streams an image over this thread's connection to its host, decoding
+    # as it arrives, and caches the bytes once complete. A kept-alive
+    # connection the server has since closed is replaced and the request
+    # retried once.
+    def download(self, request, url, redirects):
+        parts = urllib.parse.urlsplit(url)
+        target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        for attempt in range(2):
+            connection = self.connection(parts.scheme, parts.netloc)
+            try:
+                connection.request('GET', target, headers={'User-Agent': 'dashboard'})
+                response = connection.getresponse()
+                break
+            except (http.client.HTTPException, OSError):
+                self.drop_connection(parts.scheme, parts.netloc)
+                if attempt: raise
+
+        if response.status in (301, 302, 303, 307, 308) and redirects:
+            response.read()
+            location = urllib.parse.urljoin(url, response.getheader('Location', ''))
+            return self.download(request, location, redirects - 1)
+        if response.status != 200:
+            response.read()
+            raise OSError(f"HTTP {response.status}")
+
+        chunks = []
+        try:
+            pixbuf = self.decode(request, lambda: response.read(ART_FETCH_CHUNK), chunks)
+        except FetchCancelled:
+            self.drop_connection(parts.scheme, parts.netloc)
+            raise
+        store_art(request.url, b''.join(chunks))
+        return pixbuf
+
+    # This thread's open connection to a host, created on first use.
+    def connection(self, scheme, netloc):
+        connections = self.local.connections
+        connection = connections.get((scheme, netloc))
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+            connection = connections[(scheme, netloc)] = connection_class(netloc, timeout=ART_FETCH_TIMEOUT)
+        return connection
+
+    # Closes and forgets this thread's connection to a host.
+    def drop_connection(self, scheme, netloc):
+        connection = self.local.connections.pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+art_memory_cache = ArtMemoryCache()
+art_fetcher = ArtFetcher()
@@ -9,9 +9,75 @@ import threading
 import queue
 import warnings
 import os
+import time
+import concurrent.futures
+from bluez import BluezClient
+from device_registry import DeviceRegistry, known_device_type
 
 warnings.filterwarnings("ignore")
 
+# The threads querying devices in parallel when polling bluetoothctl, and
+# how many seconds a refresh may take before slow lookups are left out.
+BLUETOOTH_QUERY_WORKERS = 6
+BLUETOOTH_REFRESH_DEADLINE = 8
+
+# Service UUIDs that mark a device as audio (A2DP sink, headset, hands-free)
+# or input (HID).
+AUDIO_UUID_PREFIXES = ('0000110b', '00001108', '0000111e')
+INPUT_UUID_PREFIXES = ('00001124',)
+
+# Works out what kind of device a device is ("audio", "input", "phone" or
+# "unknown") from its name, then its Class of Device, then whether it offers
+# audio or input services.
+def classify_device(name, device_class=None, has_audio=False, has_input=False):
+    name_lower = name.lower()
+    if any(word in name_lower for word in ['headphone', 'headset', 'buds', 'earphone', 'airpods']):
+        return "audio"
+    elif any(word in name_lower for word in ['mouse']):
+        return "input"
+    elif any(word in name_lower for word in ['keyboard']):
+        return "input"
+    elif any(word in name_lower for word in ['phone']):
+        return "phone"
+    elif any(word in name_lower for word in ['speaker', 'soundbar']):
+        return "audio"
+
+    if device_class is not None:
+        major_class = (device_class >> 8) & 0x1F
+        if major_class == 4:
+            return "audio"
+        elif major_class == 5:
+            return "input"
+        elif major_class == 2:
+            return "phone"
+
+    if has_audio:
+        return "audio"
+    elif has_input:
+        return "input"
+
+    return "unknown"
+
+# Chooses a suitable icon based on a device's type or name.
+def device_icon(device_type, name):
+    device_type = device_type.lower()
+    name = name.lower()
+
+    if 'headphone' in device_type or 'audio' in device_type or 'headset' in name or 'buds' in name or 'earphone' in name:
+        return "audio-headphones-symbolic"
+    elif 'mouse' in device_type or 'mouse' in name:
+        return "input-mouse-symbolic"
+    elif 'keyboard' in device_type or 'keyboard' in name:
+        return "input-keyboard-symbolic"
+    elif 'phone' in device_type or 'phone' in name:
+        return "phone-symbolic"
+    elif 'computer' in device_type or 'laptop' in name or 'pc' in name:
+        return "computer-symbolic"
+    elif 'speaker' in name or 'soundbar' in name:
+        return "audio-speakers-symbolic"
+    else:
+        return "bluetooth-symbolic"
+
 # This class represents a single row for a Bluetooth device in the UI.
 # It displays the device's icon, name, status, and a button to connect or disconnect.
 class BluetoothDeviceWidget(Gtk.Box):
@@ -125,28 +191,16 @@ class BluetoothDeviceWidget(Gtk.Box):
             self.connect_button.add_css_class("suggested-action")
             self.status_label.set_text("Available")
 
-    # Chooses a suitable icon based on the device's type or name.
+    # Chooses a suitable icon based on the device's type or name, unless
+    # the device info already carries one.
     def get_device_icon(self):
-        device_type = self.device_info.get('type', '').lower()
-        name = self.device_info.get('name', '').lower()
-
-        if 'headphone' in device_type or 'audio' in device_type or 'headset' in name or 'buds' in name or 'earphone' in name:
-            return "audio-headphones-symbolic"
-        elif 'mouse' in device_type or 'mouse' in name:
-            return "input-mouse-symbolic"
-        elif 'keyboard' in device_type or 'keyboard' in name:
-            return "input-keyboard-symbolic"
-        elif 'phone' in device_type or 'phone' in name:
-            return "phone-symbolic"
-        elif 'computer' in device_type or 'laptop' in name or 'pc' in name:
-            return "computer-symbolic"
-        elif 'speaker' in name or 'soundbar' in name:
-            return "audio-speakers-symbolic"
-        else:
-            return "bluetooth-symbolic"
+        return self.device_info.get('icon') or device_icon(self.device_info.get('type', ''),
+                                                          self.device_info.get('name', ''))
 
 # This is the main widget for the Bluetooth panel. It manages the global
-# Bluetooth state, discovers devices, and displays them in lists.
+# Bluetooth state, discovers devices, and displays them in lists. Devices
+# come from BlueZ over D-Bus and are updated from its signals; if BlueZ
+# can't be reached on the bus, the widget falls back to polling bluetoothctl.
 class BluetoothWidget(Gtk.Box):
     # Initializes the main widget, sets up device lists, and starts a
     # background thread to handle Bluetooth commands without freezing the UI.
@@ -157,6 +211,14 @@ class BluetoothWidget(Gtk.Box):
         self.available_devices = []
         self.bluetooth_enabled = False
         self.device_widgets = {}
+        self.connecting = set()
+        self.registry = DeviceRegistry()
+        self.refresh_in_flight = False
+        self.query_pool = concurrent.futures.ThreadPoolExecutor(max_workers=BLUETOOTH_QUERY_WORKERS)
+
+        self.bluez = BluezClient(self.on_bluez_changed)
+        self.bluez_update_id = None
+        self._bluez_shown = None
 
         self.command_queue = queue.Queue()
         self.command_thread = threading.Thread(target=self.command_worker, daemon=True)
@@ -168,16 +230,22 @@ class BluetoothWidget(Gtk.Box):
 
         self.create_ui()
 
-    # This is called when the widget becomes visible. It starts the
-    # periodic checks for Bluetooth status and device scanning.
+    # This is called when the widget becomes visible. It starts following
+    # BlueZ on the first activation and the periodic device scanning. The
+    # BlueZ client keeps running while the widget is hidden, so coming back
+    # shows the current devices straight away.
     def activate(self):
         if self.is_active:
             return
         self.is_active = True
         print("BluetoothWidget Activated")
-        self.update_bluetooth_status()
-        if self.update_timer_id is None:
-            self.update_timer_id = GLib.timeout_add_seconds(3, self.update_bluetooth_status)
+        if not self.device_widgets and self.registry.devices:
+            self.connected_devices, self.available_devices = self.registry.device_lists()
+            self.update_ui()
+        self.bluez.start()
+        self._bluez_shown = None
+        self.on_bluez_changed()
+        if self.scan_timer_id is None:
             self.scan_timer_id = GLib.timeout_add_seconds(10, self.scan_devices)
 
     # This is called when the widget is hidden. It stops the periodic
@@ -187,12 +255,88 @@ class BluetoothWidget(Gtk.Box):
             return
         self.is_active = False
         print("BluetoothWidget Deactivated")
-        if self.update_timer_id:
-            GLib.source_remove(self.update_timer_id)
-            self.update_timer_id = None
+        self.stop_polling()
         if self.scan_timer_id:
             GLib.source_remove(self.scan_timer_id)
             self.scan_timer_id = None
+        if self.bluez_update_id:
+            GLib.source_remove(self.bluez_update_id)
+            self.bluez_update_id = None
+
+    # Starts polling bluetoothctl, for when BlueZ isn't reachable over D-Bus.
+    def start_polling(self):
+        if self.update_timer_id is None:
+            self._bluez_shown = None
+            self.update_bluetooth_status()
+            self.update_timer_id = GLib.timeout_add_seconds(3, self.update_bluetooth_status)
+
+    # Stops polling bluetoothctl.
+    def stop_polling(self):
+        if self.update_timer_id:
+            GLib.source_remove(self.update_timer_id)
+            self.update_timer_id = None
+
+    # Called by the BlueZ client whenever anything changes. Bursts of
+    # signals are applied together on the next idle. If BlueZ turned out to
+    # be unreachable, polling takes over until it appears.
+    def on_bluez_changed(self):
+        if not self.is_active:
+            return
+        if self.bluez.available is False:
+            self.start_polling()
+            return
+        self.stop_polling()
+        if self.bluez.available and self.bluez_update_id is None:
+            self.bluez_update_id = GLib.idle_add(self.apply_bluez_state)
+
+    # The device info the device rows show, for a device from BlueZ. The
+    # type comes from the registry for devices it already knows.
+    def bluez_device_info(self, device):
+        name = device.name or device.address
+        uuids = [uuid.lower() for uuid in device.uuids]
+        device_type = self.registry.device_type(device.address, name, lambda: classify_device(
+            name, device.device_class,
+            any(uuid.startswith(AUDIO_UUID_PREFIXES) for uuid in uuids),
+            any(uuid.startswith(INPUT_UUID_PREFIXES) for uuid in uuids)))
+        return {
+            'mac': device.address,
+            'name': name,
+            'type': device_type,
+            'icon': device_icon(device_type, name),
+            'battery': device.battery if device.connected else None,
+            'path': device.path,
+        }
+
+    # Shows BlueZ's current state. The device rows are only rebuilt when
+    # what they show has changed, so signals like RSSI updates during a scan
+    # cost nothing. Devices BlueZ has forgotten leave the registry too.
+    def apply_bluez_state(self):
+        self.bluez_update_id = None
+        self.bluetooth_enabled = self.bluez.powered
+        self.bluetooth_switch.handler_block_by_func(self.on_bluetooth_toggled)
+        self.bluetooth_switch.set_active(self.bluetooth_enabled)
+        self.bluetooth_switch.handler_unblock_by_func(self.on_bluetooth_toggled)
+
+        devices = sorted(self.bluez.devices.values(), key=lambda d: (d.name or d.address).lower())
+        connected, available = [], []
+        for device in devices:
+            if not (device.connected or device.paired): continue
+            device_info = self.bluez_device_info(device)
+            self.registry.remember(device_info, device.connected, device.rssi)
+            (connected if device.connected else available).append(device_info)
+        self.registry.retain({d['mac'] for d in connected + available})
+        shown = (self.bluetooth_enabled, connected, available, set(self.connecting))
+        if shown == self._bluez_shown:
+            return GLib.SOURCE_REMOVE
+        self._bluez_shown = shown
+
+        if self.bluetooth_enabled:
+            self.connected_devices = connected
+            self.available_devices = available
+            self.update_ui()
+        else:
+            self.show_bluetooth_disabled()
+        return GLib.SOURCE_REMOVE
 
     # This is the worker that runs in a separate thread. It picks up
     # commands from a queue and executes them safely in the background.
@@ -256,40 +400,102 @@ class BluetoothWidget(Gtk.Box):
             print(f"Bluetooth command error: {e}")
             return ""
 
-    # Checks if Bluetooth is currently powered on and updates the device list accordingly.
+    # Checks if Bluetooth is currently powered on and updates the device
+    # list accordingly. The bluetoothctl queries run on a worker thread; a
+    # check is skipped while the previous one is still running.
     def update_bluetooth_status(self):
         if not self.is_active:
             return False
 
-        status_output = self.run_bluetooth_command("bluetoothctl show")
-        self.bluetooth_enabled = "Powered: yes" in status_output
+        if not self.refresh_in_flight:
+            self.refresh_in_flight = True
+            known_types = {mac: dict(entry) for mac, entry in self.registry.devices.items()}
+            threading.Thread(target=self._refresh_worker, args=(known_types,), daemon=True).start()
+        return True
 
+    # Runs in the background thread. Gathers the power state and the device
+    # lists and hands them to the main thread in one go, or None if
+    # bluetoothctl couldn't be queried in time.
+    def _refresh_worker(self, known_types):
+        try:
+            enabled = "Powered: yes" in self.run_bluetooth_command("bluetoothctl show")
+            result = (enabled, *self.query_devices(known_types)) if enabled else (False, [], [], set())
+        except Exception as e:
+            print(f"Error refreshing Bluetooth devices: {e}")
+            result = None
+        GLib.idle_add(self.apply_refresh, result)
+
+    # Fetches the lists of connected and available (paired) devices, then
+    # looks up each device's type and battery level concurrently on the
+    # widget's pool of threads. Types already in the registry aren't looked
+    # up again. Lookups still running at the deadline are left out of this
+    # refresh, and those that haven't started are cancelled; the devices
+    # whose type is still unknown because of that are returned too, so it
+    # isn't remembered.
+    def query_devices(self, known_types):
+        deadline = time.monotonic() + BLUETOOTH_REFRESH_DEADLINE
+        pool = self.query_pool
+        connected_future = pool.submit(self.run_bluetooth_command, "bluetoothctl devices Connected")
+        paired_future = pool.submit(self.run_bluetooth_command, "bluetoothctl devices Paired")
+        connected_devices = self.parse_device_list(connected_future.result(timeout=max(0, deadline - time.monotonic())))
+        paired_devices = self.parse_device_list(paired_future.result(timeout=max(0, deadline - time.monotonic())))
+
+        connected_macs = {d['mac'] for d in connected_devices}
+        available_devices = [d for d in paired_devices if d['mac'] not in connected_macs]
+
+        lookups = {}
+        for device in connected_devices + available_devices:
+            mac, name = device['mac'], device['name']
+            known_type = known_device_type(known_types.get(mac), name)
+            if known_type:
+                device['type'] = known_type
+            else:
+                lookups[pool.submit(self.get_device_type, mac, name)] = (device, 'type')
+            if mac in connected_macs:
+                lookups[pool.submit(self.get_battery_level, mac, name)] = (device, 'battery')
+
+        done, not_done = concurrent.futures.wait(lookups, timeout=max(0, deadline - time.monotonic()))
+        for future in done:
+            device, key = lookups[future]
+            if future.exception() is None:
+                device[key] = future.result()
+        unresolved = {lookups[future][0]['mac'] for future in not_done if lookups[future][1] == 'type'}
+        if not_done:
+            print(f"Bluetooth refresh: {len(not_done)} device lookups missed the deadline")
+            for future in not_done:
+                future.cancel()
+
+        for device in connected_devices + available_devices:
+            device['icon'] = device_icon(device['type'], device['name'])
+        return connected_devices, available_devices, unresolved
+
+    # Shows a refresh's results in one update of the UI, unless BlueZ has
+    # taken over or the widget was hidden meanwhile.
+    def apply_refresh(self, result):
+        self.refresh_in_flight = False
+        if result is None or not self.is_active or self.bluez.available:
+            return GLib.SOURCE_REMOVE
+
+        self.bluetooth_enabled, connected_devices, available_devices, unresolved = result
         self.bluetooth_switch.handler_block_by_func(self.on_bluetooth_toggled)
         self.bluetooth_switch.set_active(self.bluetooth_enabled)
         self.bluetooth_switch.handler_unblock_by_func(self.on_bluetooth_toggled)
 
         if self.bluetooth_enabled:
-            self.update_devices()
+            self.connected_devices = connected_devices
+            self.available_devices = available_devices
+            for connected, devices in ((True, self.connected_devices), (False, self.available_devices)):
+                for device_info in devices:
+                    if device_info['mac'] not in unresolved:
+                        self.registry.remember(device_info, connected)
+            self.update_ui()
         else:
             self.show_bluetooth_disabled()
+        return GLib.SOURCE_REMOVE
 
-        return True
-
-    # Fetches the latest lists of connected and available (paired) devices.
-    def update_devices(self):
-        connected_output = self.run_bluetooth_command("bluetoothctl devices Connected")
-        self.connected_devices = self.parse_device_list(connected_output, connected=True)
-
-        paired_output = self.run_bluetooth_command("bluetoothctl devices Paired")
-        paired_devices = self.parse_device_list(paired_output, connected=False)
-
-        connected_macs = {d['mac'] for d in self.connected_devices}
-        self.available_devices = [d for d in paired_devices if d['mac'] not in connected_macs]
-
-        self.update_ui()
-
-    # Processes the raw text output from bluetoothctl into a clean list of devices.
-    def parse_device_list(self, output, connected=False):
+    # Processes the raw text output from bluetoothctl into a clean list of
+    # devices. Their type and battery level are filled in afterwards.
+    def parse_device_list(self, output):
         devices = []
         if not output:
             return devices
@@ -298,57 +504,24 @@ class BluetoothWidget(Gtk.Box):
             if line.startswith('Device '):
                 parts = line.split(' ', 2)
                 if len(parts) >= 3:
-                    mac = parts[1]
-                    name = parts[2]
-
                     device_info = {
-                        'mac': mac,
-                        'name': name,
-                        'type': self.get_device_type(mac, name),
-                        'battery': self.get_battery_level(mac, name) if connected else None
+                        'mac': parts[1],
+                        'name': parts[2],
+                        'type': 'unknown',
+                        'battery': None
                     }
                     devices.append(device_info)
 
         return devices
 
     # Tries to determine what kind of device it is (e.g., audio, input)
-    # by looking at its name and other technical details.
+    # by looking at its name and the details from `bluetoothctl info`.
     def get_device_type(self, mac, name):
         info_output = self.run_bluetooth_command(f"bluetoothctl info {mac}")
-
-        name_lower = name.lower()
-        if any(word in name_lower for word in ['headphone', 'headset', 'buds', 'earphone', 'airpods']):
-            return "audio"
-        elif any(word in name_lower for word in ['mouse']):
-            return "input"
-        elif any(word in name_lower for word in ['keyboard']):
-            return "input"
-        elif any(word in name_lower for word in ['phone']):
-            return "phone"
-        elif any(word in name_lower for word in ['speaker', 'soundbar']):
-            return "audio"
-
-        if "Class:" in info_output:
-            class_match = re.search(r'Class: 0x(\w+)', info_output)
-            if class_match:
-                device_class = class_match.group(1)
-                try:
-                    major_class = (int(device_class, 16) >> 8) & 0x1F
-                    if major_class == 4:
-                        return "audio"
-                    elif major_class == 5:
-                        return "input"
-                    elif major_class == 2:
-                        return "phone"
-                except ValueError:
-                    pass
-
-        if "Audio Sink" in info_output or "A2DP" in info_output:
-            return "audio"
-        elif "Human Interface Device" in info_output or "HID" in info_output:
-            return "input"
-
-        return "unknown"
+        class_match = re.search(r'Class: 0x([0-9a-fA-F]+)', info_output)
+        return classify_device(name, int(class_match.group(1), 16) if class_match else None,
+                               "Audio Sink" in info_output or "A2DP" in info_output,
+                               "Human Interface Device" in info_output or "HID" in info_output)
 
     # This function attempts to find the battery level of a device, correctly parsing
     # both decimal and hexadecimal values from the system.
@@ -428,6 +601,11 @@ class BluetoothWidget(Gtk.Box):
         if not self.bluetooth_enabled:
             return False
 
+        if self.bluez.available:
+            self.bluez.set_discovering(True)
+            GLib.timeout_add_seconds(5, lambda: self.bluez.set_discovering(False))
+            return True
+
         self.command_queue.put("bluetoothctl scan on")
         GLib.timeout_add_seconds(5, lambda: self.command_queue.put("bluetoothctl scan off"))
 
@@ -435,12 +613,16 @@ class BluetoothWidget(Gtk.Box):
 
     # This function is called when the user clicks the main on/off switch.
     def on_bluetooth_toggled(self, switch, *args):
-        if switch.get_active():
+        if self.bluez.available:
+            self.bluez.set_powered(switch.get_active())
+        elif switch.get_active():
             self.command_queue.put("bluetoothctl power on")
         else:
             self.command_queue.put("bluetoothctl power off")
 
-    # Handles clicks on the "Connect" or "Disconnect" button for a specific device.
+    # Handles clicks on the "Connect" or "Disconnect" button for a specific
+    # device. With BlueZ, the row shows the new state as soon as BlueZ
+    # signals it, and stops loading once the call has finished.
     def on_device_connect(self, device_info, connect=True):
         mac = device_info['mac']
 
@@ -448,19 +630,32 @@ class BluetoothWidget(Gtk.Box):
         if widget:
             widget.set_loading(True)
 
+        if self.bluez.available and 'path' in device_info:
+            self.connecting.add(mac)
+            self.bluez.connect_device(device_info['path'], connect, lambda ok: self.on_device_connected(mac))
+            return
+
         if connect:
             self.command_queue.put(f"bluetoothctl connect {mac}")
         else:
             self.command_queue.put(f"bluetoothctl disconnect {mac}")
 
         def update_and_hide_loading():
-            self.update_devices()
+            self.update_bluetooth_status()
             if widget:
                 widget.set_loading(False)
             return False
 
         GLib.timeout_add_seconds(3, update_and_hide_loading)
 
+    # Called when a BlueZ Connect or Disconnect call has finished.
+    def on_device_connected(self, mac):
+        self.connecting.discard(mac)
+        widget = self.device_widgets.get(mac)
+        if widget:
+            widget.set_loading(False)
+        self.on_bluez_changed()
+
     # Clears and rebuilds the entire list of devices in the UI.
     def update_ui(self):
         child = self.content_box.get_first_child()
@@ -484,6 +679,8 @@ class BluetoothWidget(Gtk.Box):
                     lambda b, d=device: self.on_device_connect(d, connect=False))
                 self.device_widgets[device['mac']] = device_widget
                 self.content_box.append(device_widget)
+                if device['mac'] in self.connecting:
+                    device_widget.set_loading(True)
 
         if self.available_devices:
             if self.connected_devices:
@@ -504,6 +701,8 @@ class BluetoothWidget(Gtk.Box):
                     lambda b, d=device: self.on_device_connect(d, connect=True))
                 self.device_widgets[device['mac']] = device_widget
                 self.content_box.append(device_widget)
+                if device['mac'] in self.connecting:
+                    device_widget.set_loading(True)
 
         if not self.connected_devices and not self.available_devices:
             self.show_no_devices()
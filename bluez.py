@@ -0,0 +1,231 @@
+from gi.repository import Gio, GLib
+
+BLUEZ_NAME = 'org.bluez'
+ADAPTER_INTERFACE = 'org.bluez.Adapter1'
+DEVICE_INTERFACE = 'org.bluez.Device1'
+BATTERY_INTERFACE = 'org.bluez.Battery1'
+OBJECT_MANAGER_INTERFACE = 'org.freedesktop.DBus.ObjectManager'
+PROPERTIES_INTERFACE = 'org.freedesktop.DBus.Properties'
+
+# Connecting to a device can take a while (the device may need to wake up).
+CONNECT_TIMEOUT_MS = 30000
+
+# A Bluetooth device as BlueZ describes it: its Device1 properties, with the
+# percentage from Battery1 when the device reports one.
+class BluezDevice:
+    def __init__(self, path):
+        self.path = path
+        self.address = ''
+        self.name = ''
+        self.icon = None
+        self.device_class = None
+        self.uuids = []
+        self.paired = False
+        self.connected = False
+        self.rssi = None
+        self.battery = None
+
+    # Applies changed properties of one of the device's interfaces.
+    def update(self, interface, properties):
+        if interface == BATTERY_INTERFACE:
+            if 'Percentage' in properties:
+                self.battery = properties['Percentage']
+            return
+        if interface != DEVICE_INTERFACE: return
+
+        for name, value in properties.items():
+            if name == 'Address':
+                self.address = value
+            elif name == 'Alias' or (name == 'Name' and not self.name):
+                self.name = value
+            elif name == 'Icon':
+                self.icon = value
+            elif name == 'Class':
+                self.device_class = value
+            elif name == 'UUIDs':
+                self.uuids = value
+            elif name == 'Paired':
+                self.paired = value
+            elif name == 'Connected':
+                self.connected = value
+            elif name == 'RSSI':
+                self.rssi = value
+
+    # Forgets properties BlueZ invalidated, like RSSI once a device is out of range.
+    def invalidate(self, interface, names):
+        if interface == DEVICE_INTERFACE and 'RSSI' in names:
+            self.rssi = None
+        elif interface == BATTERY_INTERFACE and 'Percentage' in names:
+            self.battery = None
+
+# Mirrors BlueZ's adapters and devices from the system bus. The whole tree is
+# read once with GetManagedObjects, then kept current from InterfacesAdded,
+# InterfacesRemoved and PropertiesChanged, so nothing is polled and no
+# process is spawned. `on_changed()` is called on the main thread whenever
+# anything changes. `available` is None until BlueZ has answered, then says
+# whether it is running; it follows bluetoothd starting and stopping.
+class BluezClient:
+    def __init__(self, on_changed):
+        self.on_changed = on_changed
+        self.connection = None
+        self.subscriptions = []
+        self.available = None
+        self.adapters = {}
+        self.devices = {}
+
+    # Connects to the system bus and reads BlueZ's objects.
+    def start(self):
+        if self.connection: return
+        try:
+            self.connection = Gio.bus_get_sync(Gio.BusType.SYSTEM, None)
+        except GLib.Error as e:
+            print(f"Error connecting to the system bus: {e}")
+            self.available = False
+            self.on_changed()
+            return
+
+        self.subscriptions = [
+            self.connection.signal_subscribe(BLUEZ_NAME, OBJECT_MANAGER_INTERFACE, 'InterfacesAdded', None, None,
+                                             Gio.DBusSignalFlags.NONE, self.on_interfaces_added),
+            self.connection.signal_subscribe(BLUEZ_NAME, OBJECT_MANAGER_INTERFACE, 'InterfacesRemoved', None, None,
+                                             Gio.DBusSignalFlags.NONE, self.on_interfaces_removed),
+            self.connection.signal_subscribe(BLUEZ_NAME, PROPERTIES_INTERFACE, 'PropertiesChanged', None, None,
+                                             Gio.DBusSignalFlags.NONE, self.on_properties_changed),
+            self.connection.signal_subscribe('org.freedesktop.DBus', 'org.freedesktop.DBus', 'NameOwnerChanged',
+                                             '/org/freedesktop/DBus', BLUEZ_NAME, Gio.DBusSignalFlags.NONE,
+                                             self.on_name_owner_changed),
+        ]
+        self.list_objects()
+
+    # Stops following BlueZ.
+    def stop(self):
+        if not self.connection: return
+        for subscription in self.subscriptions:
+            self.connection.signal_unsubscribe(subscription)
+        self.subscriptions = []
+        self.connection = None
+        self.available = None
+        self.adapters.clear()
+        self.devices.clear()
+
+    # Asks BlueZ for all its objects without blocking.
+    def list_objects(self):
+        self.connection.call(BLUEZ_NAME, '/', OBJECT_MANAGER_INTERFACE, 'GetManagedObjects', None,
+                             GLib.VariantType.new('(a{oa{sa{sv}}})'), Gio.DBusCallFlags.NONE, 5000, None,
+                             self.on_objects_listed)
+
+    # Replaces the mirrored objects with BlueZ's answer.
+    def on_objects_listed(self, connection, result):
+        try:
+            objects = connection.call_finish(result).unpack()[0]
+        except GLib.Error as e:
+            print(f"Error reading BlueZ objects: {e}")
+            self.available = False
+            self.on_changed()
+            return
+
+        self.adapters.clear()
+        self.devices.clear()
+        for path, interfaces in objects.items():
+            self.add_interfaces(path, interfaces)
+        self.available = True
+        self.on_changed()
+
+    # Follows bluetoothd starting and stopping.
+    def on_name_owner_changed(self, connection, sender, path, interface, signal, parameters):
+        name, old_owner, new_owner = parameters.unpack()
+        if name != BLUEZ_NAME: return
+        if new_owner:
+            self.list_objects()
+        else:
+            self.adapters.clear()
+            self.devices.clear()
+            self.available = False
+            self.on_changed()
+
+    # Mirrors the adapter, device and battery interfaces of one object.
+    def add_interfaces(self, path, interfaces):
+        if ADAPTER_INTERFACE in interfaces:
+            self.adapters.setdefault(path, {}).update(interfaces[ADAPTER_INTERFACE])
+        if DEVICE_INTERFACE in interfaces or BATTERY_INTERFACE in interfaces:
+            device = self.devices.get(path)
+            if device is None:
+                device = self.devices[path] = BluezDevice(path)
+            for interface in (DEVICE_INTERFACE, BATTERY_INTERFACE):
+                if interface in interfaces:
+                    device.update(interface, interfaces[interface])
+
+    # Applies an InterfacesAdded signal.
+    def on_interfaces_added(self, connection, sender, path, interface, signal, parameters):
+        object_path, interfaces = parameters.unpack()
+        self.add_interfaces(object_path, interfaces)
+        self.on_changed()
+
+    # Applies an InterfacesRemoved signal.
+    def on_interfaces_removed(self, connection, sender, path, interface, signal, parameters):
+        object_path, interfaces = parameters.unpack()
+        if ADAPTER_INTERFACE in interfaces:
+            self.adapters.pop(object_path, None)
+        if DEVICE_INTERFACE in interfaces:
+            self.devices.pop(object_path, None)
+        elif BATTERY_INTERFACE in interfaces and object_path in self.devices:
+            self.devices[object_path].battery = None
+        self.on_changed()
+
+    # Applies a PropertiesChanged signal from an adapter, device or battery.
+    def on_properties_changed(self, connection, sender, path, interface, signal, parameters):
+        changed_interface, changed, invalidated = parameters.unpack()
+        if changed_interface == ADAPTER_INTERFACE:
+            if path not in self.adapters: return
+            self.adapters[path].update(changed)
+            for name in invalidated:
+                self.adapters[path].pop(name, None)
+        elif changed_interface in (DEVICE_INTERFACE, BATTERY_INTERFACE):
+            device = self.devices.get(path)
+            if device is None: return
+            device.update(changed_interface, changed)
+            device.invalidate(changed_interface, invalidated)
+        else:
+            return
+        self.on_changed()
+
+    # True if any adapter is powered on.
+    @property
+    def powered(self):
+        return any(adapter.get('Powered') for adapter in self.adapters.values())
+
+    # Calls a BlueZ method asynchronously. `callback(ok)` runs on the main
+    # thread once it has finished, if given.
+    def call(self, path, interface, method, parameters=None, timeout=5000, callback=None):
+        if not self.connection: return
+        self.connection.call(BLUEZ_NAME, path, interface, method, parameters, None, Gio.DBusCallFlags.NONE,
+                             timeout, None, self.on_call_finished, (method, callback))
+
+    # Reports a failed call and hands the outcome to the caller.
+    def on_call_finished(self, connection, result, request):
+        method, callback = request
+        try:
+            connection.call_finish(result)
+            ok = True
+        except GLib.Error as e:
+            print(f"Error calling BlueZ {method}: {e}")
+            ok = False
+        if callback:
+            callback(ok)
+
+    # Turns every adapter on or off.
+    def set_powered(self, powered):
+        for path in self.adapters:
+            self.call(path, PROPERTIES_INTERFACE, 'Set',
+                      GLib.Variant('(ssv)', (ADAPTER_INTERFACE, 'Powered', GLib.Variant('b', powered))))
+
+    # Connects or disconnects the device at a BlueZ object path.
+    def connect_device(self, path, connect, callback=None):
+        self.call(path, DEVICE_INTERFACE, 'Connect' if connect else 'Disconnect',
+                  timeout=CONNECT_TIMEOUT_MS, callback=callback)
+
+    # Starts or stops discovery on every powered adapter.
+    def set_discovering(self, discovering):
+        for path, adapter in self.adapters.items():
+            if adapter.get('Powered') and bool(adapter.get('Discovering')) != discovering:
+                self.call(path, ADAPTER_INTERFACE, 'StartDiscovery' if discovering else 'StopDiscovery')
@@ -34,6 +34,7 @@ class Dashboard(Adw.ApplicationWindow):
         key_controller = Gtk.EventControllerKey()
         key_controller.connect("key-pressed", self.on_key_pressed)
         self.add_controller(key_controller)
+        self.connect("close-request", self.on_close_request)
         
         self.create_ui()
     
@@ -45,6 +46,17 @@ class Dashboard(Adw.ApplicationWindow):
             return True
         return False
     
+    # Deactivates the visible widget when the window closes, so it stops its
+    # background work and persists any state (like the notification history
+    # snapshot) the same way it does when switching views.
+    def on_close_request(self, window):
+        try:
+            if self.current_widget and hasattr(self.current_widget, 'deactivate'):
+                self.current_widget.deactivate()
+        except Exception as e:
+            print(f"Error deactivating widget on close: {e}")
+        return False
+    
     # This method builds the entire user interface, including the modern layout
     # with a sidebar and a content area (Gtk.Stack). It creates the navigation
     # buttons and defers the creation of the actual content widgets to improve
@@ -388,6 +400,15 @@ class Dashboard(Adw.ApplicationWindow):
         .invisible-scroll scrollbar slider { min-width: 0px; opacity: 0; }
         .notification-icon-bg { background: rgba(255, 255, 255, 0.1); border: 1px solid rgba(255, 255, 255, 0.2); border-radius: 24px; }
         .notifications-list { background: transparent; }
+        .notifications-list > row { background: transparent; padding: 0px; }
+        .stats-heading { font-size: 12px; font-weight: bold; color: rgba(255, 255, 255, 0.85); margin-top: 8px; }
+        .gallery-grid { background: transparent; }
+        .gallery-grid > child { padding: 4px; background: transparent; }
+        .gallery-tile { background: rgba(255, 255, 255, 0.05); border-radius: 10px; }
+        .facet-chip { border-radius: 16px; padding: 4px 12px; background: rgba(255, 255, 255, 0.05); }
+        .facet-chip:checked { background: rgba(80, 160, 255, 0.3); }
+        .facet-count { font-size: 10px; font-weight: bold; color: rgba(255, 255, 255, 0.6); }
+        .group-count { font-size: 11px; font-weight: bold; color: rgba(255, 255, 255, 0.9); background: rgba(80, 160, 255, 0.25); border-radius: 10px; padding: 2px 8px; }
         .notification-row { background: rgba(255, 255, 255, 0.03); border: 1px solid rgba(255, 255, 255, 0.08); border-radius: 12px; margin: 4px 0px; transition: all 150ms ease; }
         .notification-row:hover { background: rgba(255, 255, 255, 0.07); border-color: rgba(255, 255, 255, 0.15); }
         .notification-row.expanded { background: rgba(255, 255, 255, 0.1); border-color: rgba(255, 255, 255, 0.2); }
@@ -407,6 +428,11 @@ class Dashboard(Adw.ApplicationWindow):
         .player-icon { background: rgba(255, 255, 255, 0.1); border: 1px solid rgba(255, 255, 255, 0.2); color: rgba(255, 255, 255, 0.7); transition: all 100ms ease; }
         .player-icon:hover { background: rgba(255, 255, 255, 0.2); color: rgba(255, 255, 255, 0.9); transform: scale(1.05); }
         .player-icon.suggested-action { background: rgba(80, 160, 255, 0.2); color: white; border: 1px solid rgba(80, 160, 255, 0.4); }
+        .queue-list { background: transparent; }
+        .queue-row { padding: 4px 8px; border-radius: 8px; }
+        .queue-row.current-track { background: rgba(80, 160, 255, 0.2); }
+        .queue-art { border-radius: 6px; background: rgba(255, 255, 255, 0.05); }
+        .queue-artist { font-size: 11px; }
         .volume-scale trough { background: rgba(0, 0, 0, 0.3); border-radius: 10px; }
         .volume-scale highlight { background: rgba(255, 255, 255, 0.6); border-radius: 10px; }
         .device-header { background: rgba(255, 255, 255, 0.05); border-radius: 16px; transition: all 150ms ease; padding: 12px 16px; }
@@ -0,0 +1,122 @@
+from gi.repository import GLib
+import json
+import os
+import time
+
+REGISTRY_FILE = os.path.join(os.path.expanduser("~"), ".cache", "dashboard", "bluetooth_devices.json")
+
+# Changes are collected for this many seconds before the registry is written.
+REGISTRY_SAVE_DELAY = 2
+
+# How often, in seconds, the last-seen time of a device that is still around
+# is refreshed when nothing else about it has changed.
+REGISTRY_SEEN_INTERVAL = 60
+
+# The type remembered in a registry entry, if the entry is for a device of
+# this name and the type is worth reusing. "unknown" never is, so a device is
+# classified again until its type can be told.
+def known_device_type(entry, name):
+    if entry and entry.get('name') == name and entry.get('type') not in (None, 'unknown'):
+        return entry['type']
+    return None
+
+# What the Bluetooth panel remembers about each paired device between runs,
+# keyed by MAC address: its name, type, icon, whether it was connected, the
+# last battery level and RSSI it reported, and when it was last seen. The
+# panel shows these right away when it opens, and the type doesn't have to be
+# worked out again for a device it already knows. Entries are only touched,
+# and the file only written, when one of the fields actually changes or the
+# last-seen time is due a refresh, and they are dropped once BlueZ no longer
+# knows the device.
+class DeviceRegistry:
+    def __init__(self, path=REGISTRY_FILE):
+        self.path = path
+        self.devices = {}
+        self.save_id = None
+        self.load()
+
+    # Reads the registry file, if there is one.
+    def load(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, "r") as f:
+                    self.devices = json.load(f)
+        except Exception as e:
+            print(f"Error loading Bluetooth device registry: {e}")
+            self.devices = {}
+
+    # The remembered type of a device. `classify()` is only called for a
+    # device that is new, has been renamed, or couldn't be classified yet
+    # (its Class and services are often only known some time after pairing).
+    def device_type(self, mac, name, classify):
+        known_type = known_device_type(self.devices.get(mac), name)
+        return known_type or classify()
+
+    # Records a device's current state. A battery level or RSSI of None
+    # keeps the last known one. A device counts as seen while it is
+    # connected or in range, and when it disconnects.
+    def remember(self, device_info, connected, rssi=None):
+        fields = {
+            'name': device_info['name'],
+            'type': device_info['type'],
+            'icon': device_info['icon'],
+            'connected': connected,
+        }
+        if device_info.get('battery') is not None:
+            fields['battery'] = device_info['battery']
+        if rssi is not None:
+            fields['rssi'] = rssi
+
+        entry = self.devices.setdefault(device_info['mac'], {})
+        changed = [key for key, value in fields.items() if entry.get(key) != value]
+        now = int(time.time())
+        seen = connected or rssi is not None or 'connected' in changed
+        if seen and now - entry.get('last_seen', 0) >= REGISTRY_SEEN_INTERVAL:
+            changed.append('last_seen')
+        if not changed:
+            return
+        entry.update(fields)
+        if seen:
+            entry['last_seen'] = now
+        self.schedule_save()
+
+    # Drops the devices not in `macs`, such as ones that have been unpaired.
+    def retain(self, macs):
+        gone = [mac for mac in self.devices if mac not in macs]
+        for mac in gone:
+            del self.devices[mac]
+        if gone:
+            self.schedule_save()
+
+    # The remembered devices as device info for the device rows, split into
+    # those that were connected and the rest, in name order.
+    def device_lists(self):
+        connected, available = [], []
+        for mac, entry in sorted(self.devices.items(), key=lambda item: item[1].get('name', '').lower()):
+            device_info = {
+                'mac': mac,
+                'name': entry.get('name', mac),
+                'type': entry.get('type', 'unknown'),
+                'icon': entry.get('icon'),
+                'battery': entry.get('battery') if entry.get('connected') else None,
+            }
+            (connected if entry.get('connected') else available).append(device_info)
+        return connected, available
+
+    # Writes the registry a little later, so a burst of changes is one write.
+    def schedule_save(self):
+        if self.save_id is None:
+            self.save_id = GLib.timeout_add_seconds(REGISTRY_SAVE_DELAY, self.save)
+
+    # Writes the registry under a temporary name and renames it into place.
+    def save(self):
+        self.save_id = None
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, "w") as f:
+                json.dump(self.devices, f, indent=2)
+            os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Error saving Bluetooth device registry: {e}")
+        return False
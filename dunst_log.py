@@ -1,3 +1,4 @@
+import fcntl
 import json
 import os
 import subprocess
@@ -20,6 +21,9 @@ except ImportError as e:
 
 CONFIG = {
     'log_file': Path.home() / '.local/share/dunst/notifications.json',
+    # Held while the log is rewritten; the dashboard takes it too when it
+    # purges history, so neither overwrites the other's changes.
+    'lock_file': Path.home() / '.local/share/dunst/notifications.json.lock',
     'image_dir': Path.home() / '.local/share/dunst/images',
     'max_log_entries': 10000,
     'image_quality': 95,
@@ -308,46 +312,49 @@ class NotificationLogger:
         return saved_files[0] if saved_files else None
 
     # This takes a processed notification and appends it to our JSON log file. It also
-    # makes sure the log file doesn't grow indefinitely by trimming old entries.
+    # makes sure the log file doesn't grow indefinitely by trimming old entries. The
+    # lock is held from reading the log to replacing it, so a purge can't interleave.
     def log_notification(self, notification: Notification):
         try:
-            logs = []
-            if CONFIG['log_file'].exists():
+            with open(CONFIG['lock_file'], 'a') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                logs = []
+                if CONFIG['log_file'].exists():
+                    try:
+                        with open(CONFIG['log_file'], 'r') as f:
+                            content = f.read().strip()
+                            if content:
+                                logs = json.loads(content)
+                            if not isinstance(logs, list):
+                                logs = []
+                    except (json.JSONDecodeError, ValueError) as e:
+                        self.logger.warning(f"Corrupted JSON file, reinitializing: {e}")
+                        logs = []
+
+                notification_dict = {
+                    "timestamp": notification.timestamp,
+                    "app_name": notification.app_name,
+                    "summary": notification.summary,
+                    "body": notification.body,
+                    "icon": notification.icon,
+                    "replaces_id": notification.replaces_id
+                }
+
+                logs.append(notification_dict)
+
+                if len(logs) > CONFIG['max_log_entries']:
+                    logs = logs[-CONFIG['max_log_entries']:]
+                    self.logger.info(f"Rotated log file, kept last {CONFIG['max_log_entries']} entries")
+
+                temp_file = CONFIG['log_file'].with_suffix('.tmp')
                 try:
-                    with open(CONFIG['log_file'], 'r') as f:
-                        content = f.read().strip()
-                        if content:
-                            logs = json.loads(content)
-                        if not isinstance(logs, list):
-                            logs = []
-                except (json.JSONDecodeError, ValueError) as e:
-                    self.logger.warning(f"Corrupted JSON file, reinitializing: {e}")
-                    logs = []
-
-            notification_dict = {
-                "timestamp": notification.timestamp,
-                "app_name": notification.app_name,
-                "summary": notification.summary,
-                "body": notification.body,
-                "icon": notification.icon,
-                "replaces_id": notification.replaces_id
-            }
-
-            logs.append(notification_dict)
-
-            if len(logs) > CONFIG['max_log_entries']:
-                logs = logs[-CONFIG['max_log_entries']:]
-                self.logger.info(f"Rotated log file, kept last {CONFIG['max_log_entries']} entries")
-
-            temp_file = CONFIG['log_file'].with_suffix('.tmp')
-            try:
-                with open(temp_file, 'w') as f:
-                    json.dump(logs, f, indent=2, ensure_ascii=False)
-                temp_file.replace(CONFIG['log_file'])
-            except Exception as write_error:
-                if temp_file.exists():
-                    temp_file.unlink()
-                raise write_error
+                    with open(temp_file, 'w') as f:
+                        json.dump(logs, f, indent=2, ensure_ascii=False)
+                    temp_file.replace(CONFIG['log_file'])
+                except Exception as write_error:
+                    if temp_file.exists():
+                        temp_file.unlink()
+                    raise write_error
 
             icon_info = f" (icon: {notification.icon})" if notification.icon else ""
             self.logger.info(f"✓ Logged: {notification.app_name} - {notification.summary}{icon_info}")
@@ -0,0 +1,289 @@
+import gi
+gi.require_version('Gtk', '4.0')
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import Gtk, GLib, Gdk, GdkPixbuf
+import os
+import re
+import threading
+import queue
+from collections import OrderedDict
+
+ICON_EXTENSIONS = ('.svg', '.png', '.xpm')
+PIXMAP_DIRS = ['/usr/share/pixmaps']
+
+# The size icons are looked up and decoded at. Avatars are 48px, so this
+# leaves room for 2x scaling.
+ICON_SIZE = 96
+
+# The size gallery thumbnails are decoded at.
+THUMBNAIL_SIZE = 160
+
+# How many decoded textures the shared cache keeps.
+TEXTURE_CACHE_SIZE = 512
+
+SIZE_DIR_PATTERN = re.compile(r'^(\d+)(?:x\d+)?(?:@\d+x?)?$')
+
+# Rates a theme subdirectory (like "48x48/apps" or "scalable/apps") by how
+# well its icons suit `target_size`. Scalable icons rate highest, then the
+# smallest fixed size at or above the target, then smaller sizes; symbolic
+# icons rate lowest since they are monochrome.
+def size_score(rel_dir, target_size):
+    parts = rel_dir.split(os.sep)
+    if 'symbolic' in parts:
+        return -1
+    if 'scalable' in parts:
+        return 10000
+    for part in parts:
+        match = SIZE_DIR_PATTERN.match(part)
+        if match:
+            size = int(match.group(1))
+            return 5000 - size if size >= target_size else size
+    return 0
+
+# Reads the themes a theme inherits from, out of its index.theme file.
+def theme_parents(theme_dirs):
+    for theme_dir in theme_dirs:
+        try:
+            with open(os.path.join(theme_dir, 'index.theme'), encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith('Inherits='):
+                        return [t.strip() for t in line.split('=', 1)[1].split(',') if t.strip()]
+        except OSError:
+            continue
+    return []
+
+# Builds a map of icon names to files for a theme, the themes it inherits
+# from and hicolor, by walking each theme directory once. Names found in a
+# theme earlier in the chain win; within a theme the best size wins. Loose
+# files in the pixmap directories fill in whatever is left.
+def build_icon_index(theme_name, search_path, target_size=ICON_SIZE):
+    chain = []
+    pending = [theme_name] if theme_name else []
+    while pending:
+        theme = pending.pop(0)
+        if theme in chain: continue
+        chain.append(theme)
+        pending.extend(theme_parents([os.path.join(base, theme) for base in search_path]))
+    if 'hicolor' in chain:
+        chain.remove('hicolor')
+    chain.append('hicolor')
+
+    index = {}
+    for theme in chain:
+        best = {}
+        for base in search_path:
+            theme_dir = os.path.join(base, theme)
+            if not os.path.isdir(theme_dir): continue
+            for dirpath, dirnames, filenames in os.walk(theme_dir):
+                score = size_score(os.path.relpath(dirpath, theme_dir), target_size)
+                for filename in filenames:
+                    name, ext = os.path.splitext(filename)
+                    if ext not in ICON_EXTENSIONS or name in index: continue
+                    if name not in best or score > best[name][0]:
+                        best[name] = (score, os.path.join(dirpath, filename))
+        for name, (score, path) in best.items():
+            index[name] = path
+
+    for pixmap_dir in PIXMAP_DIRS:
+        try:
+            filenames = os.listdir(pixmap_dir)
+        except OSError:
+            continue
+        for filename in filenames:
+            name, ext = os.path.splitext(filename)
+            if ext in ICON_EXTENSIONS:
+                index.setdefault(name, os.path.join(pixmap_dir, filename))
+
+    return index
+
+# The directories icon themes are searched in, as GTK sees them.
+def icon_search_path():
+    display = Gdk.Display.get_default()
+    if display is not None:
+        return list(Gtk.IconTheme.get_for_display(display).get_search_path())
+
+    data_dirs = os.environ.get('XDG_DATA_DIRS', '/usr/local/share:/usr/share').split(':')
+    return ([os.path.expanduser('~/.local/share/icons'), os.path.expanduser('~/.icons')] +
+            [os.path.join(d, 'icons') for d in data_dirs if d])
+
+# Resolves themed icon names (like "firefox" or "discord") to files through
+# an index of the active icon theme. The index is built once on a worker
+# thread and rebuilt when the theme changes; until then lookups miss and
+# callers show their fallback. Listeners are told whenever a new index is
+# ready so they can reload the icons on screen.
+class IconIndex:
+    def __init__(self):
+        self.index = None
+        self.generation = 0
+        self.building = False
+        self.listeners = []
+        self.settings = None
+
+    # Starts building the index if it hasn't been built yet, and starts
+    # watching for theme changes.
+    def ensure(self):
+        if self.settings is None:
+            self.settings = Gtk.Settings.get_default()
+            if self.settings is not None:
+                self.settings.connect("notify::gtk-icon-theme-name", self.on_theme_changed)
+        if self.index is None and not self.building:
+            self.rebuild()
+
+    # Registers a callback run on the main thread whenever a new index is ready.
+    def connect_ready(self, callback):
+        self.listeners.append(callback)
+
+    # Walks the active theme on a worker thread. The theme name and search
+    # path are read here, since GTK objects can't be touched off the main thread.
+    def rebuild(self):
+        self.generation += 1
+        self.building = True
+        theme_name = self.settings.get_property("gtk-icon-theme-name") if self.settings else None
+        args = (self.generation, theme_name, icon_search_path())
+        threading.Thread(target=self._build_worker, args=args, daemon=True).start()
+
+    # Runs in the background thread and hands the index back to the main thread.
+    def _build_worker(self, generation, theme_name, search_path):
+        try:
+            index = build_icon_index(theme_name, search_path)
+        except Exception as e:
+            print(f"Error indexing icon theme '{theme_name}': {e}")
+            index = {}
+        GLib.idle_add(self.on_index_built, generation, index)
+
+    # Swaps in a freshly built index, unless the theme changed again meanwhile.
+    def on_index_built(self, generation, index):
+        if generation != self.generation: return GLib.SOURCE_REMOVE
+        self.index = index
+        self.building = False
+        texture_cache.clear()
+        for callback in self.listeners:
+            callback()
+        return GLib.SOURCE_REMOVE
+
+    # Rebuilds the index for the new theme. The old index keeps serving
+    # lookups until the new one is ready.
+    def on_theme_changed(self, settings, pspec):
+        self.rebuild()
+
+    # Returns the file for an icon name, or None.
+    def lookup(self, name):
+        if not name or self.index is None: return None
+        return self.index.get(name) or self.index.get(name.lower())
+
+    # Turns a notification's icon value into a file path. File paths and
+    # file:// URIs are used as they are; names go through the index, with the
+    # app name as a last guess when the icon is empty or unknown.
+    def resolve(self, icon, app_name=None):
+        if icon.startswith('file://'):
+            icon = GLib.filename_from_uri(icon)[0]
+        if os.path.isabs(icon):
+            return icon
+
+        path = self.lookup(icon)
+        if path is None and app_name:
+            path = self.lookup(app_name) or self.lookup(app_name.lower().replace(' ', '-'))
+        return path
+
+# A least-recently-used cache of decoded textures, keyed by file and size.
+# Files that fail to load are remembered too, so a missing image costs one
+# failed decode rather than a filesystem probe on every bind.
+class TextureCache:
+    def __init__(self, capacity=TEXTURE_CACHE_SIZE):
+        self.capacity = capacity
+        self.textures = OrderedDict()
+
+    # Returns the texture for a file scaled to fit `size`, or None if it
+    # can't be loaded.
+    def get(self, path, size=ICON_SIZE):
+        key = (path, size)
+        if key in self.textures:
+            self.textures.move_to_end(key)
+            return self.textures[key]
+
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, size, size, True)
+            texture = Gdk.Texture.new_for_pixbuf(pixbuf)
+        except GLib.Error as e:
+            print(f"Failed to load image '{path}': {e}")
+            texture = None
+        self.put(path, size, texture)
+        return texture
+
+    # True if the file has been decoded (or failed to) at this size.
+    def __contains__(self, key):
+        return key in self.textures
+
+    # Adds a texture (or None for a file that failed to load), evicting the
+    # least recently used entries beyond the capacity.
+    def put(self, path, size, texture):
+        self.textures[(path, size)] = texture
+        self.textures.move_to_end((path, size))
+        while len(self.textures) > self.capacity:
+            self.textures.popitem(last=False)
+
+    # Forgets all textures.
+    def clear(self):
+        self.textures.clear()
+
+# Decodes images into the texture cache on a worker thread. Requests are
+# served newest first, so while scrolling quickly the tiles that just came
+# into view are decoded before the ones already scrolled past, and requests
+# cancelled by their tile in the meantime are skipped altogether.
+class ThumbnailLoader:
+    def __init__(self):
+        self.requests = queue.LifoQueue()
+        self.waiting = {}
+        self.worker = None
+
+    # Calls `callback` with the texture for a file at `size` (or None), right
+    # away if it's cached and otherwise once it has been decoded.
+    def request(self, path, size, callback):
+        key = (path, size)
+        if key in texture_cache:
+            callback(texture_cache.get(path, size))
+            return
+
+        callbacks = self.waiting.get(key)
+        if callbacks is not None:
+            callbacks.append(callback)
+            return
+        self.waiting[key] = [callback]
+        self.requests.put(key)
+        if self.worker is None:
+            self.worker = threading.Thread(target=self._decode_worker, daemon=True)
+            self.worker.start()
+
+    # Withdraws a pending request, e.g. when its tile is scrolled out of view.
+    def cancel(self, path, size, callback):
+        key = (path, size)
+        callbacks = self.waiting.get(key)
+        if callbacks and callback in callbacks:
+            callbacks.remove(callback)
+            if not callbacks:
+                del self.waiting[key]
+
+    # Runs in the background thread, decoding one request at a time.
+    def _decode_worker(self):
+        while True:
+            key = self.requests.get()
+            if key not in self.waiting: continue
+            path, size = key
+            try:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(path, size, size, True)
+            except GLib.Error as e:
+                print(f"Failed to load image '{path}': {e}")
+                pixbuf = None
+            GLib.idle_add(self.on_decoded, key, pixbuf)
+
+    # Caches a decoded image and hands it to everyone still waiting for it.
+    def on_decoded(self, key, pixbuf):
+        texture = Gdk.Texture.new_for_pixbuf(pixbuf) if pixbuf else None
+        texture_cache.put(key[0], key[1], texture)
+        for callback in self.waiting.pop(key, []):
+            callback(texture)
+        return GLib.SOURCE_REMOVE
+
+icon_index = IconIndex()
+texture_cache = TextureCache()
+thumbnail_loader = ThumbnailLoader()
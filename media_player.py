@@ -1,21 +1,41 @@
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Adw, GLib, Pango, GdkPixbuf, Gio, Gdk
+gi.require_version('Gsk', '4.0')
+gi.require_version('Graphene', '1.0')
+from gi.repository import Gtk, Adw, GLib, Pango, GdkPixbuf, Gio, Gdk, Gsk, Graphene
 import cairo
-import subprocess
 import os
-import tempfile
 import math
-import threading
-import queue
-import warnings
-import urllib.request
-
-warnings.filterwarnings("ignore", ".*pixbuf_get_from_surface.*", DeprecationWarning)
+import json
+from mpris import MprisClient
+from art_cache import ArtMemoryCache, art_memory_cache, art_fetcher
 
 CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".config", "dashboard")
 CONFIG_FILE = os.path.join(CONFIG_DIR, "last_player.conf")
+SETTINGS_FILE = os.path.join(CONFIG_DIR, "media_player.json")
+
+# How many upcoming tracks have their art prefetched, and the priority those
+# fetches get (art for the track on screen always goes first).
+ART_PREFETCH_TRACKS = 2
+ART_PREFETCH_PRIORITY = 10
+
+# The Up Next panel's cover size, the fetch priority of its covers, how many
+# of them are kept in memory, and how many tracks' metadata is asked for in
+# one GetTracksMetadata call.
+QUEUE_ART_SIZE = 40
+QUEUE_ART_PRIORITY = 5
+QUEUE_ART_CACHE_SIZE = 128
+QUEUE_BATCH_SIZE = 50
+
+queue_art_cache = ArtMemoryCache(QUEUE_ART_CACHE_SIZE)
+
+# The settings used when the settings file doesn't set them. Players whose
+# name contains any of the `excluded_players` entries are never shown.
+DEFAULT_SETTINGS = {
+    "excluded_players": ["firefox"],
+    "auto_follow": False,
+}
 
 # Saves the name of the last used media player to a configuration file.
 # This helps the app remember your preference between sessions.
@@ -41,9 +61,30 @@ def load_last_player():
         print(f"Error loading last player: {e}")
     return None
 
+# Loads the media player settings, filling in defaults for anything missing.
+def load_settings():
+    settings = dict(DEFAULT_SETTINGS)
+    try:
+        if os.path.exists(SETTINGS_FILE):
+            with open(SETTINGS_FILE, "r") as f:
+                settings.update(json.load(f))
+    except Exception as e:
+        print(f"Error loading media player settings: {e}")
+    return settings
+
+# Saves the media player settings.
+def save_settings(settings):
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        with open(SETTINGS_FILE, "w") as f:
+            json.dump(settings, f, indent=2)
+    except Exception as e:
+        print(f"Error saving media player settings: {e}")
+
 # This is a custom GTK widget that draws a circular progress bar.
 # It also acts as a seek bar, allowing users to click on it to jump
-# to a different position in the media.
+# to a different position in the media. While a track plays, the ring follows
+# it from the frame clock instead of waiting for updates.
 class CircularProgressWidget(Gtk.DrawingArea):
     # Sets up the widget, connecting the necessary mouse click and hover events.
     def __init__(self):
@@ -64,11 +105,38 @@ class CircularProgressWidget(Gtk.DrawingArea):
         self.seek_callback = None
         self.is_hovering = False
 
+        self.progress_source = None
+        self.tick_id = None
+
     # Updates the visual progress of the circle. Expects a value between 0.0 and 1.0.
     def set_progress(self, progress):
         self.progress = max(0.0, min(1.0, progress))
         self.queue_draw()
 
+    # Follows a playing track: on every frame, `progress_source()` is asked for
+    # the current progress, and the ring is redrawn only if its arc would move
+    # by at least a pixel. GTK only runs tick callbacks while the widget is
+    # mapped, so nothing happens while it is off screen.
+    def follow(self, progress_source):
+        self.progress_source = progress_source
+        if self.tick_id is None:
+            self.tick_id = self.add_tick_callback(self.on_tick)
+
+    # Stops following the track, e.g. when it is paused.
+    def stop_following(self):
+        if self.tick_id is not None:
+            self.remove_tick_callback(self.tick_id)
+            self.tick_id = None
+        self.progress_source = None
+
+    # Called by the frame clock while following a track.
+    def on_tick(self, widget, frame_clock):
+        progress = max(0.0, min(1.0, self.progress_source()))
+        radius = min(self.get_width(), self.get_height()) / 2 - 10
+        if abs(progress - self.progress) * 2 * math.pi * radius >= 1:
+            self.set_progress(progress)
+        return GLib.SOURCE_CONTINUE
+
     # Stores a function that will be called when the user clicks to seek.
     def set_seek_callback(self, callback):
         self.seek_callback = callback
@@ -129,117 +197,210 @@ class CircularProgressWidget(Gtk.DrawingArea):
             cr.stroke()
 
 # A custom GTK widget for displaying an image cropped into a circle,
-# perfect for album art.
-class CircularImage(Gtk.DrawingArea):
-    # Initializes the drawing area and sets a default placeholder icon.
+# perfect for album art. It draws through Gtk.Snapshot: the cover is a
+# Gdk.Texture clipped to a circle with a rounded clip, so GSK composites it on
+# the GPU instead of Cairo repainting it on every frame. Remote art is cached
+# on disk, and every cover shown is kept ready in memory, so going back to a
+# track costs nothing.
+class CircularImage(Gtk.Widget):
+    # Initializes the widget and sets a default placeholder icon.
     def __init__(self, size=180):
         super().__init__()
         self.size = size
         self.set_size_request(size, size)
-        self.set_draw_func(self.draw_circular_image)
-        self.pixbuf = None
-        self.is_default_icon = True
+        self.texture = None
+        self.default_icon_node = None
+        self.generation = 0
+        self.prefetching = set()
         self.set_default_icon()
 
     # A helper function to safely update the image from a background thread,
-    # preventing UI freezes or crashes.
-    def _set_pixbuf_on_main_thread(self, pixbuf):
+    # preventing UI freezes or crashes. The prepared cover is remembered under
+    # its URL.
+    def _set_pixbuf_on_main_thread(self, pixbuf, url=None):
         if pixbuf:
-            self.pixbuf = self.create_circular_pixbuf(pixbuf)
-            self.is_default_icon = False
+            self.texture = self.create_cover_texture(pixbuf)
+            if url:
+                art_memory_cache.put((url, self.size), self.texture)
         else:
             self.set_default_icon()
         self.queue_draw()
         return GLib.SOURCE_REMOVE
 
-    # Loads an image from a local file path.
-    def set_from_file(self, file_path):
-        try:
-            pixbuf = GdkPixbuf.Pixbuf.new_from_file(file_path)
-            self._set_pixbuf_on_main_thread(pixbuf)
-        except GLib.Error as e:
-            print(f"Error loading image from file '{file_path}': {e}")
-            self._set_pixbuf_on_main_thread(None)
-
-    # Runs in a background thread to download an image from a URL without
-    # blocking the main UI.
-    def _load_url_thread(self, url):
-        try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-                urllib.request.urlretrieve(url, tmp_file.name)
-                pixbuf = GdkPixbuf.Pixbuf.new_from_file(tmp_file.name)
-                GLib.idle_add(self._set_pixbuf_on_main_thread, pixbuf)
-                os.unlink(tmp_file.name)
-        except Exception as e:
-            print(f"Error downloading or processing image from URL '{url}': {e}")
-            GLib.idle_add(self._set_pixbuf_on_main_thread, None)
+    # Shows a cover from the memory cache. Returns False if it isn't cached.
+    def show_cached(self, url):
+        texture = art_memory_cache.get((url, self.size))
+        if texture is None:
+            return False
+        self.texture = texture
+        self.queue_draw()
+        return True
 
-    # Starts the background thread to download and display an image from a URL.
+    # Shows the image for a URL (http(s) or file://): straight from memory if
+    # it was shown recently, otherwise through the shared art fetcher, which
+    # decodes it at this widget's size off the main thread. Every new image
+    # bumps the generation, which cancels whatever was still being fetched.
     def set_from_url(self, url):
-        thread = threading.Thread(target=self._load_url_thread, args=(url,))
-        thread.daemon = True
-        thread.start()
+        self.generation += 1
+        if self.show_cached(url):
+            return
+        generation = self.generation
+        art_fetcher.fetch(url, lambda pixbuf: self._set_pixbuf_on_main_thread(pixbuf, url),
+                          lambda: generation != self.generation, size=self.size)
+
+    # Fetches and prepares the cover for a URL in the background at low
+    # priority, so that showing it later is a memory cache hit.
+    def prefetch(self, url):
+        if url in self.prefetching or art_memory_cache.get((url, self.size)) is not None:
+            return
+        self.prefetching.add(url)
+        art_fetcher.fetch(url, lambda pixbuf: self.on_prefetched(url, pixbuf),
+                          lambda: url not in self.prefetching, size=self.size, priority=ART_PREFETCH_PRIORITY)
+
+    # Drops prefetches that haven't finished yet, e.g. after switching players.
+    def cancel_prefetch(self):
+        self.prefetching.clear()
+
+    # Caches a prefetched cover without showing it.
+    def on_prefetched(self, url, pixbuf):
+        self.prefetching.discard(url)
+        if pixbuf:
+            art_memory_cache.put((url, self.size), self.create_cover_texture(pixbuf))
 
     # Clears the current image and shows the default music note icon.
     def set_default_icon(self):
-        self.pixbuf = None
-        self.is_default_icon = True
+        self.generation += 1
+        self.texture = None
         self.queue_draw()
 
-    # Takes a regular rectangular image and returns a new one that is
-    # perfectly circular.
-    def create_circular_pixbuf(self, original_pixbuf):
+    # Crops an image to a centered square and scales it to the widget's size.
+    # The circle itself is a clip applied when drawing.
+    def create_cover_texture(self, original_pixbuf):
         size = self.size
         width, height = original_pixbuf.get_width(), original_pixbuf.get_height()
         min_dim = min(width, height)
         sub_pixbuf = original_pixbuf.new_subpixbuf((width - min_dim) // 2, (height - min_dim) // 2, min_dim, min_dim)
-
         scaled_pixbuf = sub_pixbuf.scale_simple(size, size, GdkPixbuf.InterpType.BILINEAR)
+        return Gdk.Texture.new_for_pixbuf(scaled_pixbuf)
+
+    # Records the default music note icon once as a render node. Later
+    # snapshots reuse the node instead of looking the icon up again.
+    def create_default_icon_node(self):
+        icon_size = int(self.size * 0.8)
+        icon_theme = Gtk.IconTheme.get_for_display(self.get_display())
+        paintable = icon_theme.lookup_icon(
+            "audio-x-generic-symbolic",
+            None,
+            icon_size,
+            1,
+            Gtk.TextDirection.NONE,
+            Gtk.IconLookupFlags.FORCE_SYMBOLIC
+        )
 
-        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, size, size)
-        ctx = cairo.Context(surface)
-        ctx.arc(size/2, size/2, size/2, 0, 2 * math.pi)
-        ctx.clip()
-        Gdk.cairo_set_source_pixbuf(ctx, scaled_pixbuf, 0, 0)
-        ctx.paint()
-
-        return Gdk.pixbuf_get_from_surface(surface, 0, 0, size, size)
-
-    # The main drawing function. It either draws the loaded circular
-    # album art or the default placeholder icon.
-    def draw_circular_image(self, area, cr, width, height, user_data=None):
-        if self.pixbuf and not self.is_default_icon:
-            Gdk.cairo_set_source_pixbuf(cr, self.pixbuf, (width - self.size) / 2, (height - self.size) / 2)
-            cr.paint()
+        snapshot = Gtk.Snapshot.new()
+        if hasattr(paintable, "snapshot_symbolic"):
+            paintable.snapshot_symbolic(snapshot, icon_size, icon_size, [Gdk.RGBA(red=1, green=1, blue=1, alpha=0.7)])
+        else:
+            paintable.snapshot(snapshot, icon_size, icon_size)
+        return snapshot.to_node()
+
+    # Appends the cover, or the default icon on a dark disc, clipped to a
+    # circle in the middle of the widget.
+    def do_snapshot(self, snapshot):
+        x = (self.get_width() - self.size) / 2
+        y = (self.get_height() - self.size) / 2
+        bounds = Graphene.Rect().init(x, y, self.size, self.size)
+
+        clip = Gsk.RoundedRect()
+        clip.init_from_rect(bounds, self.size / 2)
+        snapshot.push_rounded_clip(clip)
+
+        if self.texture:
+            snapshot.append_texture(self.texture, bounds)
         else:
-            center_x, center_y = width / 2, height / 2
-            icon_radius = self.size * 0.4
-            icon_size = int(icon_radius * 2)
-
-            cr.set_source_rgba(0.2, 0.2, 0.25, 0.8)
-            cr.arc(center_x, center_y, self.size / 2, 0, 2 * math.pi)
-            cr.fill()
-
-            icon_theme = Gtk.IconTheme.get_for_display(self.get_display())
-            paintable = icon_theme.lookup_icon(
-                "audio-x-generic-symbolic",
-                None,
-                icon_size,
-                1,
-                Gtk.TextDirection.NONE,
-                Gtk.IconLookupFlags.FORCE_SYMBOLIC
-            )
-
-            if paintable:
-                snapshot = Gtk.Snapshot.new()
-                paintable.snapshot(snapshot, icon_size, icon_size)
-                render_node = snapshot.to_node()
-                if render_node:
-                    cr.set_source_rgba(1, 1, 1, 0.7)
-                    cr.save()
-                    cr.translate(center_x - icon_radius, center_y - icon_radius)
-                    render_node.draw(cr)
-                    cr.restore()
+            snapshot.append_color(Gdk.RGBA(red=0.2, green=0.2, blue=0.25, alpha=0.8), bounds)
+            if self.default_icon_node is None:
+                self.default_icon_node = self.create_default_icon_node()
+            if self.default_icon_node:
+                offset = self.size * 0.1
+                snapshot.save()
+                snapshot.translate(Graphene.Point().init(x + offset, y + offset))
+                snapshot.append_node(self.default_icon_node)
+                snapshot.restore()
+
+        snapshot.pop()
+
+# A row of the Up Next panel: a track's small cover, title and artist. Rows
+# are recycled as the list scrolls, so a row may be bound to a track whose
+# metadata hasn't arrived yet; it shows a placeholder until `set_track` is
+# called again with the metadata.
+class QueueRow(Gtk.Box):
+    def __init__(self):
+        super().__init__(orientation=Gtk.Orientation.HORIZONTAL, spacing=10, css_classes=["queue-row"])
+        self.track_id = None
+        self.art_url = None
+        self.generation = 0
+
+        self.picture = Gtk.Picture(content_fit=Gtk.ContentFit.COVER, can_shrink=True, overflow=Gtk.Overflow.HIDDEN,
+                                   width_request=QUEUE_ART_SIZE, height_request=QUEUE_ART_SIZE,
+                                   css_classes=["queue-art"])
+        labels_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, valign=Gtk.Align.CENTER, hexpand=True)
+        self.title_label = Gtk.Label(xalign=0, ellipsize=Pango.EllipsizeMode.END, css_classes=["queue-title"])
+        self.artist_label = Gtk.Label(xalign=0, ellipsize=Pango.EllipsizeMode.END, css_classes=["dim-label", "queue-artist"])
+        labels_box.append(self.title_label)
+        labels_box.append(self.artist_label)
+
+        self.append(self.picture)
+        self.append(labels_box)
+
+    # Shows a track, or a placeholder if its metadata isn't known yet.
+    def bind(self, track_id, track, is_current):
+        self.track_id = track_id
+        self.set_current(is_current)
+        self.set_track(track)
+
+    # Forgets the track and cancels its cover if it is still being fetched.
+    def unbind(self):
+        self.track_id = None
+        self.set_art(None)
+
+    # Shows a track's metadata.
+    def set_track(self, track):
+        if track is None:
+            self.title_label.set_label("Loading…")
+            self.artist_label.set_label("")
+            self.set_art(None)
+            return
+        self.title_label.set_label(track.title or "Unknown Title")
+        self.artist_label.set_label(track.artist or "Unknown Artist")
+        self.set_art(track.art_url if track.art_url.startswith(('http', 'file')) else None)
+
+    # Highlights the row of the track that is playing.
+    def set_current(self, is_current):
+        if is_current:
+            self.add_css_class("current-track")
+        else:
+            self.remove_css_class("current-track")
+
+    # Shows a small cover from memory, or fetches it. A newer URL cancels the
+    # previous fetch.
+    def set_art(self, url):
+        if url == self.art_url: return
+        self.art_url = url
+        self.generation += 1
+        texture = queue_art_cache.get(url) if url else None
+        self.picture.set_paintable(texture)
+        if url and texture is None:
+            generation = self.generation
+            art_fetcher.fetch(url, lambda pixbuf: self.on_art(url, pixbuf), lambda: generation != self.generation,
+                              size=QUEUE_ART_SIZE, priority=QUEUE_ART_PRIORITY)
+
+    # Shows and caches a fetched cover.
+    def on_art(self, url, pixbuf):
+        if pixbuf is None: return
+        texture = Gdk.Texture.new_for_pixbuf(pixbuf)
+        queue_art_cache.put(url, texture)
+        self.picture.set_paintable(texture)
 
 # A simple, circular button used to represent a single media player
 # (like Spotify, a browser, etc.).
@@ -285,10 +446,11 @@ class PlayerIconButton(Gtk.Button):
             self.remove_css_class("suggested-action")
 
 # The main widget that brings everything together. It finds media players,
-# displays their info, and provides playback controls.
+# displays their info, and provides playback controls. Player state comes from
+# the MPRIS D-Bus interface and is pushed to the widget by signals.
 class MediaPlayerWidget(Gtk.Box):
-    # Sets up the entire media player UI, state variables, and starts a
-    # background thread for sending commands.
+    # Sets up the entire media player UI, state variables, and the MPRIS
+    # client that tracks the players and sends them commands.
     def __init__(self):
         super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=15)
 
@@ -297,52 +459,48 @@ class MediaPlayerWidget(Gtk.Box):
         self.player_buttons = []
         self._last_known_art_url = None
         self.saved_player_preference = load_last_player()
+        self.settings = load_settings()
+        self.follow_mark = 0
 
         self._is_seeking = False
         self._is_volume_changing = False
+        self._shown_time = None
+        self._prefetched_for = None
+
+        # The Up Next panel's track ids, the rows bound to them, the batches
+        # of tracks waiting for their metadata to be fetched, and the track
+        # list and current track it shows.
+        self.queue_ids = []
+        self.queue_rows = {}
+        self.queue_batches = set()
+        self.queue_fetch_id = None
+        self._queue_shown_for = None
+        self._queue_current = None
 
         self.is_active = False
-        self.update_timer_id = None
 
-        self.command_queue = queue.Queue()
-        self.command_thread = threading.Thread(target=self._command_worker, daemon=True)
-        self.command_thread.start()
+        self.mpris = MprisClient(self.on_players_changed, self.on_player_updated, self.on_tracks_fetched)
 
         self.create_ui()
 
-    # A background worker that runs in a separate thread. It processes a
-    # queue of commands (like 'play', 'pause') so that the UI never freezes.
-    def _command_worker(self):
-        while True:
-            try:
-                command = self.command_queue.get()
-                if command:
-                    subprocess.run(command, shell=True, capture_output=True, text=True, timeout=2)
-                self.command_queue.task_done()
-            except queue.Empty:
-                continue
-            except Exception as e:
-                print(f"Error in command worker: {e}")
-
-    # Starts the main update loop when the widget becomes visible.
+    # Starts following the MPRIS players on the first activation and shows
+    # the current state. The client keeps running while the widget is hidden,
+    # so coming back never has to rediscover the players.
     def activate(self):
         if self.is_active:
             return
         self.is_active = True
         print("MediaPlayerWidget Activated")
-        self.update_all_info()
-        if self.update_timer_id is None:
-            self.update_timer_id = GLib.timeout_add(1000, self.update_all_info)
+        self.mpris.start()
+        self.on_players_changed()
 
-    # Stops the main update loop when the widget is hidden to save resources.
+    # Stops updating the UI when the widget is hidden to save resources.
     def deactivate(self):
         if not self.is_active:
             return
         self.is_active = False
         print("MediaPlayerWidget Deactivated")
-        if self.update_timer_id:
-            GLib.source_remove(self.update_timer_id)
-            self.update_timer_id = None
+        self.progress_widget.stop_following()
 
     # Builds all the visual components of the widget (labels, buttons,
     # album art, etc.) and arranges them.
@@ -352,7 +510,14 @@ class MediaPlayerWidget(Gtk.Box):
         self.set_margin_start(20)
         self.set_margin_end(20)
 
+        players_row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8, halign=Gtk.Align.CENTER)
         self.players_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8, halign=Gtk.Align.CENTER)
+        self.follow_button = Gtk.ToggleButton(icon_name="emblem-synchronizing-symbolic", css_classes=["circular", "flat"],
+                                              tooltip_text="Follow the player that starts playing",
+                                              active=self.settings["auto_follow"], valign=Gtk.Align.CENTER)
+        self.follow_button.connect("toggled", self.on_follow_toggled)
+        players_row.append(self.players_box)
+        players_row.append(self.follow_button)
 
         art_container = Gtk.Overlay(halign=Gtk.Align.CENTER)
         self.progress_widget = CircularProgressWidget()
@@ -379,13 +544,13 @@ class MediaPlayerWidget(Gtk.Box):
         controls_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=15, halign=Gtk.Align.CENTER, margin_top=10)
         self.prev_button = Gtk.Button(icon_name="media-skip-backward-symbolic", css_classes=["circular", "control-button"], sensitive=False)
         self.prev_button.set_size_request(44, 44)
-        self.prev_button.connect("clicked", lambda b: self._queue_command("previous"))
+        self.prev_button.connect("clicked", lambda b: self._call_player("Previous"))
         self.play_pause_button = Gtk.Button(icon_name="media-playback-start-symbolic", css_classes=["circular", "play-button"], sensitive=False)
         self.play_pause_button.set_size_request(56, 56)
         self.play_pause_button.connect("clicked", self.on_play_pause_clicked)
         self.next_button = Gtk.Button(icon_name="media-skip-forward-symbolic", css_classes=["circular", "control-button"], sensitive=False)
         self.next_button.set_size_request(44, 44)
-        self.next_button.connect("clicked", lambda b: self._queue_command("next"))
+        self.next_button.connect("clicked", lambda b: self._call_player("Next"))
         controls_box.append(self.prev_button)
         controls_box.append(self.play_pause_button)
         controls_box.append(self.next_button)
@@ -401,70 +566,115 @@ class MediaPlayerWidget(Gtk.Box):
         volume_box.append(Gtk.Image(icon_name="audio-volume-medium-symbolic"))
         volume_box.append(self.volume_scale)
 
-        self.append(self.players_box)
+        self.append(players_row)
         self.append(art_container)
         self.append(track_info_box)
         self.append(controls_box)
         self.append(volume_box)
-
-    # A helper to run a quick command that needs an immediate result,
-    # like getting the list of players.
-    def _run_sync_command(self, cmd):
-        try:
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=0.5)
-            return result.stdout.strip() if result.returncode == 0 else None
-        except subprocess.TimeoutExpired:
-            print(f"Timeout running command: {cmd}")
-            return None
-        except Exception:
-            return None
-
-    # Adds a player command (like 'next' or 'previous') to the queue
-    # to be executed by the background worker.
-    def _queue_command(self, command):
-        if self.current_player:
-            self.command_queue.put(f"playerctl -p {self.current_player} {command}")
+        self.append(self.create_queue_panel())
+
+    # Builds the Up Next panel. It lists the player's track list in a list
+    # view over a string list of track ids, so even thousands of tracks show
+    # at once; metadata is only fetched for the rows scrolled into view.
+    def create_queue_panel(self):
+        self.queue_model = Gtk.StringList()
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", lambda f, list_item: list_item.set_child(QueueRow()))
+        factory.connect("bind", self.on_queue_row_bind)
+        factory.connect("unbind", self.on_queue_row_unbind)
+
+        queue_view = Gtk.ListView(model=Gtk.NoSelection(model=self.queue_model), factory=factory,
+                                  single_click_activate=True, css_classes=["queue-list"])
+        queue_view.connect("activate", self.on_queue_activated)
+
+        queue_scroll = Gtk.ScrolledWindow(child=queue_view, propagate_natural_height=True, max_content_height=240,
+                                          css_classes=["invisible-scroll"])
+        queue_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+
+        self.queue_expander = Gtk.Expander(label="Up Next", child=queue_scroll, visible=False, margin_top=10)
+        self.queue_expander.connect("notify::expanded", self.on_queue_expanded)
+        return self.queue_expander
+
+    # The state of the player on screen, or None.
+    def _current_state(self):
+        return self.mpris.players.get(self.current_player) if self.current_player else None
+
+    # Sends a transport command (like Next or PlayPause) to the player on
+    # screen as an asynchronous D-Bus call.
+    def _call_player(self, method):
+        state = self._current_state()
+        if state:
+            self.mpris.call(state, method)
 
     # Handles clicks on the play/pause button. It instantly updates the
-    # icon for responsiveness and then queues the actual command.
+    # icon for responsiveness and then sends the actual command.
     def on_play_pause_clicked(self, button):
         is_currently_playing = "media-playback-pause-symbolic" in button.get_icon_name()
         new_icon = "media-playback-start-symbolic" if is_currently_playing else "media-playback-pause-symbolic"
         button.set_icon_name(new_icon)
-        self._queue_command("play-pause")
+        self._call_player("PlayPause")
 
-    # Queues a command to change the player's volume when the user adjusts the slider.
+    # Sets the player's volume when the user adjusts the slider. Only the
+    # latest value is sent while a previous change is still in flight.
     def on_volume_changed(self, scale):
         if self._is_volume_changing: return
-        volume = scale.get_value()
-        self._queue_command(f"volume {volume}")
+        state = self._current_state()
+        if state:
+            self.mpris.set_volume(state, scale.get_value())
 
     # Handles the user clicking on a different player icon. It updates the
-    # state and saves the new choice.
+    # state and saves the new choice. The new player is drawn straight from
+    # its cached state; auto-follow only moves away from it once another
+    # player starts playing.
     def on_player_selected(self, player_name):
         if self.current_player != player_name:
             self.current_player = player_name
             self.saved_player_preference = player_name
+            self.follow_mark = GLib.get_monotonic_time()
             save_last_player(self.current_player)
             self._last_known_art_url = None
-            self.update_all_info(force_update=True)
+            self.album_art.cancel_prefetch()
             self.update_player_buttons_state()
-
-    # The heart of the widget. This function runs periodically to check for
-    # available players, get the current song's metadata, and update the entire UI.
-    def update_all_info(self, force_update=False):
+            self.render_current_player()
+
+    # Turns auto-follow on or off and remembers the choice. Turning it on
+    # jumps to the most recent player to start playing.
+    def on_follow_toggled(self, button):
+        self.settings["auto_follow"] = button.get_active()
+        save_settings(self.settings)
+        if button.get_active():
+            self.follow_mark = 0
+            self.on_players_changed()
+
+    # True if a player is hidden by the excluded players setting.
+    def is_excluded(self, player_name):
+        return any(f.lower() in player_name.lower() for f in self.settings["excluded_players"])
+
+    # The playing player that most recently started playing, if any.
+    def most_recently_started(self):
+        playing = [self.mpris.players[p] for p in self.players if self.mpris.players[p].is_playing]
+        return max(playing, key=lambda state: state.started_playing).name if playing else None
+
+    # Called by the MPRIS client when players appear or disappear. It rebuilds
+    # the player buttons and picks which player to show: with auto-follow on,
+    # the one that most recently started playing.
+    def on_players_changed(self):
         if not self.is_active:
-            return GLib.SOURCE_REMOVE
-
-        players_output = self._run_sync_command("playerctl -l 2>/dev/null")
-        new_players = [p for p in (players_output.split('\n') if players_output else []) if 'firefox' not in p.lower()]
+            return
 
-        if new_players != self.players or force_update:
+        new_players = [p for p in self.mpris.players if not self.is_excluded(p)]
+        if new_players != self.players:
             self.players = new_players
             self._rebuild_player_buttons()
 
         target_player = None
-        if self.saved_player_preference and self.saved_player_preference in self.players:
+        followed = self.most_recently_started() if self.settings["auto_follow"] else None
+        if followed and self.mpris.players[followed].started_playing > self.follow_mark:
+            target_player = followed
+            self.follow_mark = self.mpris.players[followed].started_playing
+        elif self.settings["auto_follow"] and self.current_player in self.players:
+            target_player = self.current_player
+        elif self.saved_player_preference and self.saved_player_preference in self.players:
             target_player = self.saved_player_preference
         elif self.current_player and self.current_player in self.players:
             target_player = self.current_player
@@ -474,74 +684,202 @@ class MediaPlayerWidget(Gtk.Box):
         if self.current_player != target_player:
             self.current_player = target_player
             self._last_known_art_url = None
+            self.album_art.cancel_prefetch()
             self.update_player_buttons_state()
 
-        if not self.current_player:
-            self._reset_ui_to_default()
-            return GLib.SOURCE_CONTINUE
+        self.render_current_player()
 
-        metadata_output = self._run_sync_command(
-            f"playerctl -p {self.current_player} metadata --format "
-            "'{{status}};{{mpris:length}};{{volume}};{{mpris:artUrl}};{{title}};{{artist}}'"
-        )
-        position_str = self._run_sync_command(f"playerctl -p {self.current_player} position")
+    # Called by the MPRIS client whenever a player's state changes, with the
+    # state kept for every player. Only the player on screen needs redrawing,
+    # unless auto-follow moves to a player that started playing after the
+    # current one was picked.
+    def on_player_updated(self, state):
+        if not self.is_active:
+            return
+        if (self.settings["auto_follow"] and state.name != self.current_player and state.name in self.players
+                and state.is_playing and state.started_playing > self.follow_mark):
+            self.follow_mark = state.started_playing
+            self.current_player = state.name
+            self._last_known_art_url = None
+            self.album_art.cancel_prefetch()
+            self.update_player_buttons_state()
+        if state.name == self.current_player:
+            self.render_player(state)
+            self.prefetch_upcoming_art(state)
+            self.update_queue(state)
+
+    # Prefetches the art of the next few tracks in the player's track list,
+    # so when the track changes its cover is already prepared in memory and
+    # shows on the same frame as the new title. Tracks whose metadata isn't
+    # known yet are fetched first; this runs again once it arrives.
+    def prefetch_upcoming_art(self, state):
+        key = (state.name, state.track_id, state.tracks_version)
+        if key == self._prefetched_for: return
+        self._prefetched_for = key
+
+        upcoming = state.upcoming_tracks(ART_PREFETCH_TRACKS)
+        self.mpris.fetch_tracks(state, upcoming)
+        for track_id in upcoming:
+            track = state.track_metadata.get(track_id)
+            if track and track.art_url.startswith(('http', 'file')):
+                self.album_art.prefetch(track.art_url)
+
+    # Called by the MPRIS client when track metadata arrives.
+    def on_tracks_fetched(self, state, ids):
+        if not self.is_active or state.name != self.current_player: return
+        self._prefetched_for = None
+        self.prefetch_upcoming_art(state)
+        for track_id in ids:
+            row = self.queue_rows.get(track_id)
+            if row:
+                row.set_track(state.track_metadata.get(track_id))
+
+    # Shows the Up Next panel for players with a track list and, while it is
+    # expanded, brings it up to date. Only the part of the list that changed
+    # is spliced into the model, so the rows around it keep their place.
+    def update_queue(self, state):
+        tracks = state.tracks if state else []
+        self.queue_expander.set_visible(bool(tracks))
+        if not self.queue_expander.get_expanded(): return
+
+        key = (state.name, state.tracks_version) if tracks else None
+        if key != self._queue_shown_for:
+            self._queue_shown_for = key
+            old, new = self.queue_ids, list(tracks)
+            start = 0
+            while start < min(len(old), len(new)) and old[start] == new[start]:
+                start += 1
+            end = 0
+            while end < min(len(old), len(new)) - start and old[-1 - end] == new[-1 - end]:
+                end += 1
+            self.queue_ids = new
+            self.queue_model.splice(start, len(old) - start - end, new[start:len(new) - end])
+            for track_id, row in self.queue_rows.items():
+                row.set_track(state.track_metadata.get(track_id) if state else None)
+
+        current = state.track_id if state else None
+        if current != self._queue_current:
+            for track_id in (self._queue_current, current):
+                row = self.queue_rows.get(track_id)
+                if row:
+                    row.set_current(track_id == current)
+            self._queue_current = current
+
+    # Fills the panel in when it is expanded.
+    def on_queue_expanded(self, expander, pspec):
+        if expander.get_expanded():
+            self._queue_shown_for = None
+            self.update_queue(self._current_state())
+
+    # Shows a track in a recycled row, and queues the fetch of its batch of
+    # metadata if it isn't known yet.
+    def on_queue_row_bind(self, factory, list_item):
+        track_id = list_item.get_item().get_string()
+        state = self._current_state()
+        track = state.track_metadata.get(track_id) if state else None
+        row = list_item.get_child()
+        row.bind(track_id, track, track_id == self._queue_current)
+        self.queue_rows[track_id] = row
+        if track is None:
+            self.queue_batches.add(list_item.get_position() // QUEUE_BATCH_SIZE)
+            if self.queue_fetch_id is None:
+                self.queue_fetch_id = GLib.idle_add(self.fetch_queue_batches)
+
+    # Releases a row scrolled out of view.
+    def on_queue_row_unbind(self, factory, list_item):
+        row = list_item.get_child()
+        if self.queue_rows.get(row.track_id) is row:
+            del self.queue_rows[row.track_id]
+        row.unbind()
+
+    # Fetches the metadata of the batches rows were bound in since the last
+    # idle, one GetTracksMetadata call per batch.
+    def fetch_queue_batches(self):
+        self.queue_fetch_id = None
+        state = self._current_state()
+        if state:
+            for batch in sorted(self.queue_batches):
+                self.mpris.fetch_tracks(state, self.queue_ids[batch * QUEUE_BATCH_SIZE:(batch + 1) * QUEUE_BATCH_SIZE])
+        self.queue_batches.clear()
+        return GLib.SOURCE_REMOVE
 
-        if not metadata_output:
-            self.current_player = None
+    # Plays the clicked track.
+    def on_queue_activated(self, list_view, position):
+        state = self._current_state()
+        if state and position < len(self.queue_ids):
+            self.mpris.go_to(state, self.queue_ids[position])
+
+    # Shows the current player's state, or the default UI if there is none.
+    def render_current_player(self):
+        state = self._current_state()
+        if state is None:
+            self.progress_widget.stop_following()
             self._reset_ui_to_default()
-            return GLib.SOURCE_CONTINUE
+            self.update_queue(None)
+            return
+        self.render_player(state)
+        self.prefetch_upcoming_art(state)
+        self.update_queue(state)
 
+    # Updates the whole UI from a player's state.
+    def render_player(self, state):
         try:
-            status, length_us_str, vol_str, art_url, title, artist = metadata_output.split(';', 5)
-
-            is_playing = (status == 'Playing')
+            is_playing = state.is_playing
             self.play_pause_button.set_icon_name("media-playback-pause-symbolic" if is_playing else "media-playback-start-symbolic")
-            self.title_label.set_label(title or "Unknown Title")
-            self.artist_label.set_label(artist or "Unknown Artist")
-
-            try: length_s = int(float(length_us_str) / 1000000)
-            except (ValueError, TypeError): length_s = 0
-            try: position_s = int(float(position_str))
-            except (ValueError, TypeError): position_s = 0
-
-            if position_s > length_s and length_s > 0: position_s = length_s
+            self.title_label.set_label(state.title or "Unknown Title")
+            self.artist_label.set_label(state.artist or "Unknown Artist")
 
             if not self._is_seeking:
-                self.time_label.set_text(f"{self.format_time(position_s)} / {self.format_time(length_s)}")
-                self.progress_widget.set_progress(position_s / length_s if length_s > 0 else 0)
+                self.progress_widget.set_progress(self._update_position(state))
 
+            art_url = state.art_url
             if art_url != self._last_known_art_url:
                 self._last_known_art_url = art_url
                 if art_url and art_url.startswith(('http', 'file')):
-                    if art_url.startswith('http'):
-                        self.album_art.set_from_url(art_url)
-                    else:
-                        self.album_art.set_from_file(art_url.replace('file://', ''))
+                    self.album_art.set_from_url(art_url)
                 else:
                     self.album_art.set_default_icon()
 
             self._is_volume_changing = True
-            try: self.volume_scale.set_value(float(vol_str))
-            except (ValueError, TypeError): self.volume_scale.set_value(0.5)
+            self.volume_scale.set_value(state.volume if state.volume is not None else 0.5)
             self._is_volume_changing = False
 
             for w in [self.play_pause_button, self.prev_button, self.next_button, self.volume_scale, self.progress_widget]:
                 w.set_sensitive(True)
 
         except Exception as e:
-            print(f"Error parsing metadata ('{metadata_output}' and '{position_str}'): {e}")
+            print(f"Error showing state of player '{state.name}': {e}")
             self._reset_ui_to_default()
 
-        return GLib.SOURCE_CONTINUE
+        if state.is_playing:
+            self.progress_widget.follow(self._on_progress_frame)
+        else:
+            self.progress_widget.stop_following()
+
+    # Updates the time label from the player's interpolated position, only when
+    # the shown second changes, and returns the progress as 0.0 to 1.0.
+    def _update_position(self, state):
+        length_s = int(state.length_us / 1000000)
+        position_us = state.current_position_us()
+        shown_time = (int(position_us / 1000000), length_s)
+        if shown_time != self._shown_time:
+            self._shown_time = shown_time
+            self.time_label.set_text(f"{self.format_time(shown_time[0])} / {self.format_time(length_s)}")
+        return position_us / state.length_us if state.length_us > 0 else 0
+
+    # Called by the progress ring on every frame while the track plays.
+    def _on_progress_frame(self):
+        state = self._current_state()
+        if state is None or self._is_seeking:
+            return self.progress_widget.progress
+        return self._update_position(state)
 
     # Called when the user clicks the circular progress bar. It calculates
-    # the new position and queues a seek command.
+    # the new position from the cached track length and seeks there.
     def on_seek(self, progress):
-        if not self.current_player: return
-        length_us_str = self._run_sync_command(f"playerctl -p {self.current_player} metadata mpris:length")
-
-        try: total_seconds = int(float(length_us_str) / 1000000)
-        except (ValueError, TypeError, AttributeError): return
+        state = self._current_state()
+        if not state: return
+        total_seconds = int(state.length_us / 1000000)
         if total_seconds == 0: return
 
         self._is_seeking = True
@@ -549,8 +887,7 @@ class MediaPlayerWidget(Gtk.Box):
         self.progress_widget.set_progress(progress)
         self.time_label.set_text(f"{self.format_time(target_seconds)} / {self.format_time(total_seconds)}")
 
-        target_position_for_playerctl = total_seconds * progress
-        self._queue_command(f"position {target_position_for_playerctl}")
+        self.mpris.seek_to(state, int(state.length_us * progress))
 
         GLib.timeout_add(1000, lambda: setattr(self, '_is_seeking', False))
 
@@ -581,6 +918,7 @@ class MediaPlayerWidget(Gtk.Box):
         self.title_label.set_label("No Media Playing")
         self.artist_label.set_label("Waiting for a player...")
         self.time_label.set_text("--:-- / --:--")
+        self._shown_time = None
         self.album_art.set_default_icon()
         self.progress_widget.set_progress(0)
         self.play_pause_button.set_icon_name("media-playback-start-symbolic")
@@ -0,0 +1,416 @@
+from gi.repository import Gio, GLib
+
+MPRIS_PREFIX = 'org.mpris.MediaPlayer2.'
+MPRIS_PATH = '/org/mpris/MediaPlayer2'
+PLAYER_INTERFACE = 'org.mpris.MediaPlayer2.Player'
+TRACKLIST_INTERFACE = 'org.mpris.MediaPlayer2.TrackList'
+
+# The track id a TrackAdded signal uses to mean "at the start of the list".
+NO_TRACK = '/org/mpris/MediaPlayer2/TrackList/NoTrack'
+
+# The fields shown for a track in a player's track list, picked out of its
+# MPRIS metadata dictionary.
+class Track:
+    def __init__(self, metadata):
+        self.track_id = metadata.get('mpris:trackid')
+        self.title = metadata.get('xesam:title', '')
+        artist = metadata.get('xesam:artist', '')
+        self.artist = ', '.join(artist) if isinstance(artist, list) else artist
+        self.art_url = metadata.get('mpris:artUrl', '')
+
+# The state of one MPRIS player, mirrored from the properties its D-Bus proxy
+# has cached. The proxy keeps those up to date from PropertiesChanged, so
+# reading them never costs a round trip. Players don't signal their position
+# as it moves, so it is extrapolated from the last known Position, Rate and
+# PlaybackStatus against the monotonic clock.
+class PlayerState:
+    def __init__(self, name, proxy):
+        self.name = name
+        self.proxy = proxy
+        self.handlers = []
+
+        self.status = 'Stopped'
+        self.title = ''
+        self.artist = ''
+        self.art_url = ''
+        self.length_us = 0
+        self.track_id = None
+        self.volume = None
+        self.rate = 1.0
+        self.position_us = 0
+        self.position_time = GLib.get_monotonic_time()
+        self.started_playing = 0
+
+        # The player's track list, if it has one: the ids in play order, and
+        # the metadata of the tracks fetched so far. `tracks_version` changes
+        # whenever the list does.
+        self.tracklist = None
+        self.tracklist_handlers = []
+        self.tracks = []
+        self.tracks_version = 0
+        self.track_metadata = {}
+        self.requested_tracks = set()
+
+        self.update(proxy.get_cached_property_names() or [])
+
+    # Copies the named properties out of the proxy's cache.
+    def update(self, names):
+        for name in names:
+            value = self.proxy.get_cached_property(name)
+            if value is None: continue
+            value = value.unpack()
+            if name == 'PlaybackStatus':
+                self.set_position(self.current_position_us())
+                if value == 'Playing' and self.status != 'Playing':
+                    self.started_playing = GLib.get_monotonic_time()
+                self.status = value
+            elif name == 'Metadata':
+                track_id = self.track_id
+                self.set_metadata(value)
+                if self.track_id != track_id:
+                    self.set_position(0)
+            elif name == 'Volume':
+                self.volume = value
+            elif name == 'Rate':
+                self.set_position(self.current_position_us())
+                self.rate = value
+            elif name == 'Position':
+                self.set_position(value)
+
+    # Records a known position, as of now.
+    def set_position(self, position_us):
+        self.position_us = position_us
+        self.position_time = GLib.get_monotonic_time()
+
+    # The position right now: the last known one, advanced by the time since
+    # at the playback rate while playing, and capped at the track length.
+    def current_position_us(self):
+        position_us = self.position_us
+        if self.status == 'Playing':
+            position_us += (GLib.get_monotonic_time() - self.position_time) * self.rate
+        if self.length_us > 0:
+            position_us = min(position_us, self.length_us)
+        return max(0, int(position_us))
+
+    # Picks the fields the widget shows out of an MPRIS metadata dictionary.
+    def set_metadata(self, metadata):
+        self.title = metadata.get('xesam:title', '')
+        artist = metadata.get('xesam:artist', '')
+        self.artist = ', '.join(artist) if isinstance(artist, list) else artist
+        self.art_url = metadata.get('mpris:artUrl', '')
+        try: self.length_us = int(metadata.get('mpris:length', 0))
+        except (ValueError, TypeError): self.length_us = 0
+        self.track_id = metadata.get('mpris:trackid')
+
+    # True if the player is currently playing.
+    @property
+    def is_playing(self):
+        return self.status == 'Playing'
+
+    # Replaces the track list. Metadata of tracks no longer in it is dropped.
+    def set_tracks(self, tracks):
+        self.tracks = list(tracks)
+        kept = set(self.tracks)
+        self.track_metadata = {t: m for t, m in self.track_metadata.items() if t in kept}
+        self.tracks_version += 1
+
+    # Applies a TrackList signal to the track list. Returns False for signals
+    # that don't change it.
+    def apply_tracklist_signal(self, signal_name, parameters):
+        if signal_name == 'TrackListReplaced':
+            self.set_tracks(parameters[0])
+        elif signal_name == 'TrackAdded':
+            track = Track(parameters[0])
+            if not track.track_id: return False
+            after = parameters[1]
+            index = self.tracks.index(after) + 1 if after in self.tracks else 0 if after == NO_TRACK else len(self.tracks)
+            self.tracks.insert(index, track.track_id)
+            self.track_metadata[track.track_id] = track
+        elif signal_name == 'TrackRemoved':
+            if parameters[0] not in self.tracks: return False
+            self.tracks.remove(parameters[0])
+            self.track_metadata.pop(parameters[0], None)
+        elif signal_name == 'TrackMetadataChanged':
+            old_id, track = parameters[0], Track(parameters[1])
+            if old_id not in self.tracks: return False
+            track.track_id = track.track_id or old_id
+            self.tracks[self.tracks.index(old_id)] = track.track_id
+            self.track_metadata.pop(old_id, None)
+            self.track_metadata[track.track_id] = track
+        else:
+            return False
+        self.tracks_version += 1
+        return True
+
+    # The ids of the next `count` tracks after the current one.
+    def upcoming_tracks(self, count):
+        if self.track_id not in self.tracks: return []
+        index = self.tracks.index(self.track_id) + 1
+        return self.tracks[index:index + count]
+
+# Tracks every MPRIS player on the session bus. Players are found with one
+# ListNames call and then followed through NameOwnerChanged; each gets a
+# Gio.DBusProxy whose PropertiesChanged and Seeked signals drive updates, so
+# nothing is polled and no process is spawned. Callbacks run on the main
+# thread: `on_players_changed()` when players come or go,
+# `on_player_updated(state)` when one of them changes (including its track
+# list), and `on_tracks_fetched(state, ids)` when metadata asked for with
+# `fetch_tracks` arrives.
+class MprisClient:
+    def __init__(self, on_players_changed, on_player_updated, on_tracks_fetched=None):
+        self.on_players_changed = on_players_changed
+        self.on_player_updated = on_player_updated
+        self.on_tracks_fetched = on_tracks_fetched
+        self.players = {}
+        self.pending = set()
+        self.connection = None
+        self.subscription_id = None
+        self.in_flight = set()
+        self.latest_calls = {}
+
+    # Connects to the session bus and starts following players.
+    def start(self):
+        if self.connection: return
+        try:
+            self.connection = Gio.bus_get_sync(Gio.BusType.SESSION, None)
+        except GLib.Error as e:
+            print(f"Error connecting to the session bus: {e}")
+            return
+
+        self.subscription_id = self.connection.signal_subscribe(
+            'org.freedesktop.DBus', 'org.freedesktop.DBus', 'NameOwnerChanged', '/org/freedesktop/DBus',
+            MPRIS_PREFIX.rstrip('.'), Gio.DBusSignalFlags.MATCH_ARG0_NAMESPACE, self.on_name_owner_changed)
+        self.connection.call('org.freedesktop.DBus', '/org/freedesktop/DBus', 'org.freedesktop.DBus', 'ListNames',
+                             None, GLib.VariantType.new('(as)'), Gio.DBusCallFlags.NONE, -1, None,
+                             self.on_names_listed)
+
+    # Stops following players and drops their proxies.
+    def stop(self):
+        if not self.connection: return
+        self.connection.signal_unsubscribe(self.subscription_id)
+        for state in self.players.values():
+            self.disconnect_player(state)
+        self.players.clear()
+        self.pending.clear()
+        self.connection = None
+        self.subscription_id = None
+
+    # Adds the players that were already running when the client started.
+    def on_names_listed(self, connection, result):
+        try:
+            names = connection.call_finish(result).unpack()[0]
+        except GLib.Error as e:
+            print(f"Error listing bus names: {e}")
+            return
+        for bus_name in names:
+            if bus_name.startswith(MPRIS_PREFIX):
+                self.add_player(bus_name)
+
+    # Follows players appearing on and leaving the bus.
+    def on_name_owner_changed(self, connection, sender, path, interface, signal, parameters):
+        bus_name, old_owner, new_owner = parameters.unpack()
+        if not bus_name.startswith(MPRIS_PREFIX): return
+        if old_owner:
+            self.remove_player(bus_name)
+        if new_owner:
+            self.add_player(bus_name)
+
+    # Creates the proxy for a player asynchronously.
+    def add_player(self, bus_name):
+        name = bus_name[len(MPRIS_PREFIX):]
+        if name in self.players or name in self.pending: return
+        self.pending.add(name)
+        Gio.DBusProxy.new(self.connection,
+                          Gio.DBusProxyFlags.GET_INVALIDATED_PROPERTIES | Gio.DBusProxyFlags.DO_NOT_AUTO_START,
+                          None, bus_name, MPRIS_PATH, PLAYER_INTERFACE, None, self.on_proxy_ready, name)
+
+    # Starts tracking a player once its proxy has loaded its properties.
+    def on_proxy_ready(self, source, result, name):
+        if name not in self.pending: return
+        self.pending.discard(name)
+        try:
+            proxy = Gio.DBusProxy.new_finish(result)
+        except GLib.Error as e:
+            print(f"Error creating proxy for player '{name}': {e}")
+            return
+
+        state = PlayerState(name, proxy)
+        state.handlers = [proxy.connect("g-properties-changed", self.on_properties_changed, state),
+                          proxy.connect("g-signal", self.on_signal, state)]
+        self.players[name] = state
+        self.fetch_position(state)
+        Gio.DBusProxy.new(self.connection,
+                          Gio.DBusProxyFlags.GET_INVALIDATED_PROPERTIES | Gio.DBusProxyFlags.DO_NOT_AUTO_START,
+                          None, proxy.get_name(), MPRIS_PATH, TRACKLIST_INTERFACE, None,
+                          self.on_tracklist_ready, state)
+        self.on_players_changed()
+
+    # Follows a player's track list. Players without one still get a proxy,
+    # it just never has any tracks.
+    def on_tracklist_ready(self, source, result, state):
+        try:
+            proxy = Gio.DBusProxy.new_finish(result)
+        except GLib.Error as e:
+            print(f"Error creating track list proxy for player '{state.name}': {e}")
+            return
+        if self.players.get(state.name) is not state: return
+
+        state.tracklist = proxy
+        state.tracklist_handlers = [proxy.connect("g-properties-changed", self.on_tracklist_changed, state),
+                                    proxy.connect("g-signal", self.on_tracklist_signal, state)]
+        tracks = proxy.get_cached_property('Tracks')
+        if tracks is not None:
+            state.set_tracks(tracks.unpack())
+            self.on_player_updated(state)
+
+    # Disconnects from a player's proxies.
+    def disconnect_player(self, state):
+        for handler in state.handlers:
+            state.proxy.disconnect(handler)
+        for handler in state.tracklist_handlers:
+            state.tracklist.disconnect(handler)
+        state.handlers = []
+        state.tracklist_handlers = []
+
+    # Forgets a player that left the bus.
+    def remove_player(self, bus_name):
+        name = bus_name[len(MPRIS_PREFIX):]
+        self.pending.discard(name)
+        state = self.players.pop(name, None)
+        if state is None: return
+        self.disconnect_player(state)
+        self.on_players_changed()
+
+    # Applies a PropertiesChanged signal. Players don't signal Position as it
+    # moves, so it is fetched again whenever the status or track changes.
+    def on_properties_changed(self, proxy, changed, invalidated, state):
+        names = list(changed.unpack().keys()) + list(invalidated)
+        state.update(names)
+        if 'PlaybackStatus' in names or 'Metadata' in names:
+            self.fetch_position(state)
+        self.on_player_updated(state)
+
+    # Applies a Seeked signal, which carries the new position.
+    def on_signal(self, proxy, sender, signal_name, parameters, state):
+        if signal_name == 'Seeked':
+            state.set_position(parameters.unpack()[0])
+            self.on_player_updated(state)
+
+    # Applies a change of the Tracks property. The proxy fetches it again
+    # after each invalidation, so this is the whole new list.
+    def on_tracklist_changed(self, proxy, changed, invalidated, state):
+        tracks = proxy.get_cached_property('Tracks')
+        if tracks is None: return
+        state.set_tracks(tracks.unpack())
+        self.on_player_updated(state)
+
+    # Applies the TrackList signals that change the list.
+    def on_tracklist_signal(self, proxy, sender, signal_name, parameters, state):
+        if state.apply_tracklist_signal(signal_name, parameters.unpack()):
+            self.on_player_updated(state)
+
+    # Fetches the metadata of tracks in a player's track list with one
+    # GetTracksMetadata call. Tracks already known or already asked for are
+    # left out.
+    def fetch_tracks(self, state, ids):
+        ids = [t for t in ids if t not in state.track_metadata and t not in state.requested_tracks]
+        if not ids or state.tracklist is None: return
+        state.requested_tracks.update(ids)
+        state.tracklist.call('GetTracksMetadata', GLib.Variant('(ao)', (ids,)), Gio.DBusCallFlags.NONE, 2000, None,
+                             self.on_tracks_metadata, (state, ids))
+
+    # Stores fetched track metadata and reports which tracks it was for.
+    def on_tracks_metadata(self, proxy, result, request):
+        state, ids = request
+        state.requested_tracks.difference_update(ids)
+        try:
+            metadata = proxy.call_finish(result).unpack()[0]
+        except GLib.Error as e:
+            print(f"Error fetching track metadata from player '{state.name}': {e}")
+            return
+        for entry in metadata:
+            track = Track(entry)
+            if track.track_id in state.tracks:
+                state.track_metadata[track.track_id] = track
+        if self.on_tracks_fetched and self.players.get(state.name) is state:
+            self.on_tracks_fetched(state, ids)
+
+    # Jumps to a track in a player's track list.
+    def go_to(self, state, track_id):
+        if state.tracklist is None: return
+        state.tracklist.call('GoTo', GLib.Variant('(o)', (track_id,)), Gio.DBusCallFlags.NONE, 2000, None,
+                             self.on_call_finished, 'GoTo')
+
+    # Asks the player for its current position without blocking.
+    def fetch_position(self, state):
+        state.proxy.call('org.freedesktop.DBus.Properties.Get',
+                         GLib.Variant('(ss)', (PLAYER_INTERFACE, 'Position')),
+                         Gio.DBusCallFlags.NONE, 1000, None, self.on_position_fetched, state)
+
+    # Stores a fetched position.
+    def on_position_fetched(self, proxy, result, state):
+        try:
+            state.set_position(proxy.call_finish(result).unpack()[0])
+        except GLib.Error:
+            return
+        if self.players.get(state.name) is state:
+            self.on_player_updated(state)
+
+    # Calls a player method asynchronously on the shared session connection.
+    # Calls on one connection are delivered in order, so transport commands
+    # keep the order they were sent in.
+    def call(self, state, method, parameters=None):
+        state.proxy.call(method, parameters, Gio.DBusCallFlags.NONE, 2000, None, self.on_call_finished, method)
+
+    # Reports a failed call.
+    def on_call_finished(self, proxy, result, method):
+        try:
+            proxy.call_finish(result)
+        except GLib.Error as e:
+            print(f"Error calling {method}: {e}")
+
+    # Calls a method where only the latest value matters, like a volume
+    # change. While a call of the same kind to the same player is in flight,
+    # newer values replace each other and only the last one is sent once the
+    # reply arrives.
+    def call_latest(self, state, kind, method, parameters):
+        key = (state.name, kind)
+        if key in self.in_flight:
+            self.latest_calls[key] = (method, parameters)
+            return
+        self.in_flight.add(key)
+        state.proxy.call(method, parameters, Gio.DBusCallFlags.NONE, 2000, None,
+                         self.on_latest_call_finished, (state, kind, method))
+
+    # Sends the value that came in while the previous call was in flight.
+    def on_latest_call_finished(self, proxy, result, call):
+        state, kind, method = call
+        try:
+            proxy.call_finish(result)
+        except GLib.Error as e:
+            print(f"Error calling {method}: {e}")
+        key = (state.name, kind)
+        self.in_flight.discard(key)
+        pending = self.latest_calls.pop(key, None)
+        if pending and self.players.get(state.name) is state:
+            self.call_latest(state, kind, *pending)
+
+    # Sets a player's volume (0.0 to 1.0).
+    def set_volume(self, state, volume):
+        self.call_latest(state, 'volume', 'org.freedesktop.DBus.Properties.Set',
+                         GLib.Variant('(ssv)', (PLAYER_INTERFACE, 'Volume', GLib.Variant('d', volume))))
+
+    # Moves a player to an absolute position in the current track. SetPosition
+    # needs the track id; players that don't report one get a relative Seek.
+    # Seeks are relative to the previous target, so one that replaces a Seek
+    # still waiting to be sent takes over its offset rather than dropping it.
+    def seek_to(self, state, position_us):
+        if state.track_id:
+            self.call_latest(state, 'position', 'SetPosition', GLib.Variant('(ox)', (state.track_id, position_us)))
+        else:
+            offset = position_us - state.current_position_us()
+            pending = self.latest_calls.get((state.name, 'position'))
+            if pending and pending[0] == 'Seek':
+                offset += pending[1].unpack()[0]
+            self.call_latest(state, 'position', 'Seek', GLib.Variant('(x)', (offset,)))
+        state.set_position(position_us)
@@ -0,0 +1,943 @@
+import bisect
+import fcntl
+import heapq
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+from datetime import datetime, date
+
+PAGE_SIZE = 200
+
+# The number of hours of activity kept by the statistics (one week).
+STATS_HOURS = 168
+
+# The time facets the history can be filtered by.
+TIME_RANGES = ('today', 'week', 'older')
+
+# The snapshot file layout: a fixed header (magic, format version, the log's
+# size and mtime when the snapshot was taken, the log offset older history
+# resumes from, the record count and the metadata length), JSON metadata, the
+# sort keys as doubles, record offsets into the blob, and the records
+# themselves as individually encoded JSON. Bump the version on any change.
+SNAPSHOT_MAGIC = b'DNSNAP'
+SNAPSHOT_VERSION = 2
+SNAPSHOT_HEADER = struct.Struct('<6sHQqqII')
+
+# The most bytes of the record older history resumes at that are kept to find
+# that record again after the log has been rewritten.
+ANCHOR_SIZE = 256
+
+# Parses a notification's ISO timestamp into epoch seconds. Naive timestamps
+# (which is what dunst_log.py writes) are treated as local time. Returns None
+# if the timestamp is missing or can't be parsed.
+def parse_timestamp(ts_str):
+    if not ts_str: return None
+
+    try:
+        try:
+            ts = datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
+        except ValueError:
+            ts = datetime.fromisoformat(ts_str)
+
+        if ts.tzinfo is None:
+            ts = ts.astimezone()
+        return ts.timestamp()
+    except (ValueError, TypeError) as e:
+        print(f"Could not parse timestamp '{ts_str}': {e}")
+        return None
+
+# The order the history is kept in: newest first, with notifications whose
+# timestamp couldn't be parsed at the very end.
+def sort_key(notification):
+    epoch = notification.get('epoch')
+    return -epoch if epoch is not None else float('inf')
+
+# The local calendar day (as a date ordinal) an epoch falls on, or None.
+def day_of(epoch):
+    return datetime.fromtimestamp(epoch).date().toordinal() if epoch is not None else None
+
+# The day ordinals that make up a time facet, relative to today. "week" is
+# the current calendar week (from Monday), including today; "older" is
+# everything before it and has no fixed set of days.
+def range_days(time_range):
+    today = date.today()
+    if time_range == 'today':
+        return [today.toordinal()]
+    if time_range == 'week':
+        return list(range(today.toordinal() - today.weekday(), today.toordinal() + 1))
+    return None
+
+# True if a notification falls into a time facet.
+def in_time_range(notification, time_range):
+    days = range_days('week' if time_range == 'older' else time_range)
+    inside = day_of(notification.get('epoch')) in days
+    return not inside if time_range == 'older' else inside
+
+# A key that identifies a logged notification independently of where it sits
+# in the file, used to find where previously loaded history starts.
+def record_key(notification):
+    return (notification.get('timestamp'), notification.get('app_name'), notification.get('summary'))
+
+# Reads the record whose "{" line follows `offset` in a log open in binary
+# mode, as dunst_log.py lays it out. Returns the record and the offset of its
+# closing line, or (None, None) if no record starts there.
+def record_at(file, offset):
+    file.seek(offset)
+    lines = []
+    position = offset
+    for line in file:
+        stripped = line.strip()
+        if not lines and not stripped:
+            position += len(line)
+            continue
+        if not lines and stripped != b'{':
+            break
+        if stripped in (b'}', b'},'):
+            try:
+                record = json.loads(b''.join(lines) + b'}')
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                break
+            return (record, position) if isinstance(record, dict) else (None, None)
+        lines.append(line)
+        position += len(line)
+    return None, None
+
+# The key and leading bytes of the record at `offset`, which together find
+# it again once the log has been rewritten, or None if no record starts there.
+# The closing line is left out of the anchor, since it gains a comma as soon
+# as a newer record is logged after it.
+def resume_point(file, offset):
+    record, close = record_at(file, offset)
+    if record is None:
+        return None
+    file.seek(offset)
+    return record_key(record), file.read(min(ANCHOR_SIZE, close - offset))
+
+# Finds the offset of the record a resume point was taken at. Rotation and
+# purges only ever remove records, so it can only have moved towards the start
+# of the log: the log is searched backwards from `offset` for the anchor, and
+# a match only counts if the record there still has the same key. Returns
+# None if the record is gone.
+def locate_resume_offset(path, offset, key, anchor):
+    try:
+        with open(path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            position = min(offset, size)
+            end = min(offset + len(anchor), size)
+            while True:
+                start = max(0, position - LogReverseReader.BLOCK_SIZE)
+                f.seek(start)
+                block = f.read(end - start)
+                found = block.rfind(anchor)
+                while found >= 0:
+                    if start + found <= position:
+                        record, close = record_at(f, start + found)
+                        if record is not None and record_key(record) == key:
+                            return start + found
+                    found = block.rfind(anchor, 0, found + len(anchor) - 1)
+                if start == 0:
+                    return None
+                position = start - 1
+                end = min(start + len(anchor), size)
+    except OSError as e:
+        print(f"Error reading notifications file: {e}")
+        return None
+
+# True if the record with `key` is among the newest PAGE_SIZE records of the
+# log, which is as far back as load_new() looks for it.
+def has_recent_record(path, key):
+    try:
+        reader = LogReverseReader(path)
+    except OSError:
+        return False
+    try:
+        for _ in range(PAGE_SIZE):
+            page = reader.read_records(1)
+            if not page:
+                return False
+            if record_key(page[0]) == key:
+                return True
+        return False
+    finally:
+        reader.close()
+
+# Reads the notification log backwards, newest record first, without parsing
+# the whole file. dunst_log.py writes the log as an indented JSON array of flat
+# objects, so every record starts with a line holding only "{" and ends with a
+# line holding only "}" or "},". The file is read in blocks from the end and
+# only the records that are asked for get decoded.
+class LogReverseReader:
+    BLOCK_SIZE = 64 * 1024
+
+    # Opens the log and positions the reader at its end, or at `end` to resume
+    # from an earlier reader. The open handle keeps pointing at the same file
+    # even if the logger atomically replaces it, so older pages stay
+    # consistent with the first one.
+    def __init__(self, path, end=None):
+        self.file = open(path, 'rb')
+        self.file.seek(0, os.SEEK_END)
+        self.position = self.file.tell() if end is None else min(end, self.file.tell())
+        self.lines = []
+        self.carry = b''
+        self.record_lines = None
+        self.found_any = False
+        self.saw_stray_data = False
+        self.fallback = None
+
+    # Closes the underlying file.
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    # True once every record in the file has been returned.
+    def exhausted(self):
+        if self.fallback is not None:
+            return not self.fallback
+        return self.position == 0 and not self.lines and not self.carry
+
+    # The offset in the file up to which nothing has been returned yet, so a
+    # new reader created with `end` set to it continues where this one left
+    # off. None if the reader is in the middle of a record or in fallback mode.
+    def unread_end(self):
+        if self.fallback is not None or self.record_lines is not None:
+            return None
+        if self.position == 0 and not self.carry:
+            return max(0, sum(len(line) + 1 for line in self.lines) - 1)
+        return self.position + len(self.carry) + sum(len(line) + 1 for line in self.lines)
+
+    # Reads raw bytes at an offset, from the file this reader was opened on.
+    def read_at(self, offset, size):
+        self.file.seek(offset)
+        return self.file.read(size)
+
+    # Returns up to `count` records, continuing backwards from where the last
+    # call stopped. Records that fail to decode are skipped.
+    def read_records(self, count):
+        records = []
+        while len(records) < count:
+            if self.fallback is not None:
+                if not self.fallback: break
+                records.append(self.fallback.pop())
+                continue
+
+            line = self._previous_line()
+            if line is None:
+                if not self.found_any and self.saw_stray_data:
+                    self._load_fallback()
+                    continue
+                break
+
+            stripped = line.strip()
+            if self.record_lines is None:
+                if stripped in (b'}', b'},'):
+                    self.record_lines = [b'}']
+                elif stripped not in (b'', b'[', b']', b'[]'):
+                    self.saw_stray_data = True
+                continue
+
+            self.record_lines.append(line)
+            if stripped == b'{':
+                self.record_lines.reverse()
+                raw = b'\n'.join(self.record_lines)
+                self.record_lines = None
+                try:
+                    record = json.loads(raw)
+                except (json.JSONDecodeError, UnicodeDecodeError) as e:
+                    print(f"Skipping unreadable notification record: {e}")
+                    continue
+                self.found_any = True
+                if isinstance(record, dict):
+                    records.append(record)
+        return records
+
+    # Returns the line before the current position, reading another block
+    # from the file when the buffered lines run out.
+    def _previous_line(self):
+        while not self.lines:
+            if self.position == 0:
+                if self.carry:
+                    line, self.carry = self.carry, b''
+                    return line
+                return None
+
+            start = max(0, self.position - self.BLOCK_SIZE)
+            self.file.seek(start)
+            block = self.file.read(self.position - start) + self.carry
+            self.position = start
+
+            self.lines = block.split(b'\n')
+            self.carry = self.lines.pop(0) if start > 0 else b''
+        return self.lines.pop()
+
+    # Logs that weren't written by dunst_log.py (for example a compact array)
+    # have no line structure to walk, so they are parsed in one go instead.
+    def _load_fallback(self):
+        self.file.seek(0)
+        try:
+            logs = json.loads(self.file.read() or b'[]')
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"Error reading notifications file: {e}")
+            logs = []
+        self.fallback = [n for n in logs if isinstance(n, dict)]
+
+# Reads a snapshot written by NotificationStore.save_snapshot(). The file is
+# memory-mapped and records are only decoded page by page, in sorted order,
+# as they are asked for. Raises ValueError if the file isn't a snapshot of
+# the current format, or is truncated or corrupt.
+class SnapshotReader:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.map = None
+        self.view = None
+        self.keys = None
+        self.offsets = None
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            (magic, version, self.log_size, self.log_mtime_ns, self.resume_offset,
+             self.count, meta_length) = SNAPSHOT_HEADER.unpack_from(self.map, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError("not a current notification snapshot")
+
+            position = SNAPSHOT_HEADER.size
+            self.blob_start = position + meta_length + 16 * self.count + 8
+            if len(self.map) < self.blob_start:
+                raise ValueError("truncated notification snapshot")
+            meta = json.loads(self.map[position:position + meta_length])
+            self.tail_key = tuple(meta['tail_key'])
+            self.resume_key = tuple(meta['resume_key']) if meta['resume_key'] is not None else None
+            self.anchor = bytes.fromhex(meta['anchor'])
+            position += meta_length
+
+            self.view = memoryview(self.map)
+            self.keys = self.view[position:position + 8 * self.count].cast('d')
+            position += 8 * self.count
+            self.offsets = self.view[position:position + 8 * (self.count + 1)].cast('Q')
+            if len(self.map) < self.blob_start + self.offsets[self.count]:
+                raise ValueError("truncated notification snapshot")
+        except (ValueError, KeyError, TypeError, IndexError, struct.error):
+            self.close()
+            raise ValueError(f"Unreadable notification snapshot '{path}'")
+        self.next_index = 0
+
+    # Releases the mapping and the file.
+    def close(self):
+        for view in (self.keys, self.offsets, self.view):
+            if view is not None:
+                view.release()
+        self.keys = self.offsets = self.view = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    # True once every record in the snapshot has been returned.
+    def exhausted(self):
+        return self.next_index >= self.count
+
+    # The encoded bytes of record `i`.
+    def blob(self, i):
+        return self.map[self.blob_start + self.offsets[i]:self.blob_start + self.offsets[i + 1]]
+
+    # Decodes the next `count` records, returning them with their sort keys
+    # and the bytes they were decoded from.
+    def read_records(self, count):
+        start, end = self.next_index, min(self.count, self.next_index + count)
+        blobs = [self.blob(i) for i in range(start, end)]
+        self.next_index = end
+        return [json.loads(blob) for blob in blobs], list(self.keys[start:end]), blobs
+
+    # The sort keys and encoded bytes of the records not read yet, without
+    # decoding them.
+    def unread(self):
+        return list(self.keys[self.next_index:self.count]), [self.blob(i) for i in range(self.next_index, self.count)]
+
+# Returns (size, mtime in ns) for the log, or None if it doesn't exist.
+def log_stat(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+# Deletes a snapshot that no longer matches the log, such as after a purge.
+def remove_snapshot(snapshot_path):
+    try:
+        os.remove(snapshot_path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Error removing notification snapshot: {e}")
+
+# Describes which notifications a purge removes: everything, everything from
+# one app, everything older than a cutoff (epoch seconds), or a combination.
+class PurgeFilter:
+    def __init__(self, app_name=None, older_than=None):
+        self.app_name = app_name
+        self.older_than = older_than
+
+    # True if the notification should be removed.
+    def matches(self, notification):
+        if self.app_name is not None and notification.get('app_name', 'System') != self.app_name:
+            return False
+        if self.older_than is not None:
+            epoch = notification['epoch'] if 'epoch' in notification else parse_timestamp(notification.get('timestamp', ''))
+            if epoch is None or epoch >= self.older_than:
+                return False
+        return True
+
+# Removes the notifications matching a PurgeFilter from the log, then deletes
+# the images those notifications reference. Only files inside `image_dir` that
+# no remaining notification still uses are deleted. This is meant to run on a
+# worker thread: `on_log_written` is called once the log has been rewritten,
+# and `progress(done, total)` while the images are being deleted. The log is
+# read and rewritten under the lock dunst_log.py takes to append to it, so a
+# notification logged meanwhile waits for the purge instead of being lost.
+def purge_history(path, image_dir, purge_filter, on_log_written=None, progress=None):
+    with open(path + '.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        logs = []
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                content = f.read().strip()
+            logs = json.loads(content) if content else []
+
+        kept, removed = [], []
+        for n in logs:
+            if isinstance(n, dict) and purge_filter.matches(n):
+                removed.append(n)
+            else:
+                kept.append(n)
+
+        if removed:
+            temp_file = path + '.purge'
+            try:
+                with open(temp_file, 'w') as f:
+                    json.dump(kept, f, indent=2, ensure_ascii=False)
+                os.replace(temp_file, path)
+            except Exception:
+                if os.path.exists(temp_file):
+                    os.unlink(temp_file)
+                raise
+
+    if on_log_written:
+        on_log_written(len(removed))
+
+    image_dir = os.path.realpath(image_dir)
+    still_used = {n.get('icon') for n in kept if isinstance(n, dict)}
+    images = []
+    for n in removed:
+        icon = n.get('icon') or ''
+        if icon and icon not in still_used and os.path.dirname(os.path.realpath(icon)) == image_dir:
+            images.append(icon)
+            still_used.add(icon)
+
+    for done, image in enumerate(images, 1):
+        try:
+            os.remove(image)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Could not delete notification image '{image}': {e}")
+        if progress and (done % 50 == 0 or done == len(images)):
+            progress(done, len(images))
+
+    return len(removed), len(images)
+
+# The hour an epoch falls in, counted in local time, so that hour % 24 is the
+# local hour of the day even in time zones that are off UTC by half an hour.
+def local_hour(epoch):
+    offset = datetime.fromtimestamp(epoch).astimezone().utcoffset().total_seconds()
+    return int((epoch + offset) // 3600)
+
+# Rolling per-app notification counts for the last STATS_HOURS hours. Each
+# app has an array of hourly counts used as a ring buffer indexed by the
+# absolute local hour; a slot is cleared when the hour it holds leaves the
+# window.
+# Counts are updated as records are added or purged, so reading the stats
+# never touches the history itself.
+class ActivityStats:
+    def __init__(self):
+        self.slot_hours = array('q', [-1]) * STATS_HOURS
+        self.counts = {}
+        self.now_hour = local_hour(time.time())
+
+    # Moves the window forward to the current hour, clearing the slots of
+    # hours that dropped out of it.
+    def advance(self):
+        self.now_hour = local_hour(time.time())
+        oldest = self.now_hour - STATS_HOURS + 1
+        for slot in range(STATS_HOURS):
+            if 0 <= self.slot_hours[slot] < oldest:
+                self._clear(slot)
+
+    # Counts a notification (or uncounts it, with a negative delta) in the
+    # hour it was sent, if that hour is inside the window.
+    def add(self, notification, delta=1):
+        epoch = notification.get('epoch')
+        if epoch is None: return
+
+        hour = local_hour(epoch)
+        if hour > self.now_hour:
+            self.advance()
+        if hour > self.now_hour or hour <= self.now_hour - STATS_HOURS:
+            return
+
+        slot = hour % STATS_HOURS
+        if self.slot_hours[slot] != hour:
+            if delta < 0: return
+            self._clear(slot)
+            self.slot_hours[slot] = hour
+
+        app_name = notification.get('app_name', 'System')
+        counts = self.counts.get(app_name)
+        if counts is None:
+            counts = self.counts[app_name] = array('I', [0]) * STATS_HOURS
+        counts[slot] = max(0, counts[slot] + delta)
+
+    # The absolute local hours of the window, oldest first.
+    def hours(self):
+        return range(self.now_hour - STATS_HOURS + 1, self.now_hour + 1)
+
+    # An app's hourly counts over the window, oldest first.
+    def app_series(self, app_name):
+        counts = self.counts.get(app_name)
+        if counts is None:
+            return [0] * STATS_HOURS
+        return [counts[hour % STATS_HOURS] if self.slot_hours[hour % STATS_HOURS] == hour else 0
+                for hour in self.hours()]
+
+    # The apps that sent the most notifications in the window, as a list of
+    # (app name, count), busiest first.
+    def top_senders(self, limit=None):
+        totals = [(app_name, sum(counts)) for app_name, counts in self.counts.items()]
+        totals = sorted((t for t in totals if t[1]), key=lambda t: -t[1])
+        return totals[:limit] if limit else totals
+
+    # The number of notifications sent in each local hour of the day (0-23),
+    # summed over the window.
+    def hour_of_day_totals(self):
+        totals = [0] * 24
+        for hour in self.hours():
+            slot = hour % STATS_HOURS
+            if self.slot_hours[slot] == hour:
+                totals[hour % 24] += sum(c[slot] for c in self.counts.values())
+        return totals
+
+    # Resets one slot for every app.
+    def _clear(self, slot):
+        for counts in self.counts.values():
+            counts[slot] = 0
+        self.slot_hours[slot] = -1
+
+# Holds the notification history that has been loaded so far, newest first.
+# Only the newest page is read when the store is opened; older pages are read
+# on demand, and notifications appended by the logger are picked up from the
+# end of the file without rereading the rest. The order is kept by inserting
+# each record at its position with bisect over parsed epoch keys, so neither
+# case ever re-sorts, and records logged out of order still land correctly.
+# Per-app and per-day postings lists (sets of record ids) are kept up to date
+# as records come and go, so facet counts and filters never scan the history.
+# Records whose icon is an image saved by the logger into `image_dir` are
+# tracked the same way.
+class NotificationStore:
+    def __init__(self, path, image_dir=None):
+        self.path = path
+        self.image_dir = image_dir
+        self.records = []
+        self.keys = []
+        self.tail_key = None
+        self.reader = None
+        self.snapshot = None
+        self.resume_offset = None
+        self.resume_key = None
+        self.resume_anchor = None
+        self.stat = None
+        self.purge_filters = []
+        self.dirty = False
+        self.by_id = {}
+        self.app_postings = {}
+        self.day_postings = {}
+        self.image_postings = set()
+        self.generation = 0
+        self.search_cache = None
+        self.stats = ActivityStats()
+        self.encoded = {}
+
+    # True if everything logged since `since` (epoch seconds) is loaded.
+    def covers(self, since):
+        if not self.has_more():
+            return True
+        return bool(self.keys) and -self.keys[-1] < since
+
+    # True if there is older history left to load.
+    def has_more(self):
+        if self.snapshot is not None or self.resume_offset:
+            return True
+        return self.reader is not None and not self.reader.exhausted()
+
+    # Drops everything loaded so far and reads the newest page of the log.
+    def open(self, count=PAGE_SIZE):
+        self._reset()
+        self.stat = log_stat(self.path)
+        if self.stat is None:
+            return []
+
+        self.reader = LogReverseReader(self.path)
+        return self.load_more(count)
+
+    # Restores the history saved by save_snapshot() instead of reading the log,
+    # decoding only its first page. The snapshot is only used if the log still
+    # has both the newest record it saw and the record older history resumes
+    # at, which is found by its key wherever rotation has moved it; anything
+    # appended since is picked up by the next load_new(). Returns False if
+    # there was nothing usable to restore.
+    def restore_snapshot(self, snapshot_path, count=PAGE_SIZE):
+        try:
+            snapshot = SnapshotReader(snapshot_path)
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Ignoring notification snapshot: {e}")
+            return False
+
+        resume_offset = 0
+        valid = log_stat(self.path) is not None and has_recent_record(self.path, snapshot.tail_key)
+        if valid and snapshot.resume_offset:
+            resume_offset = locate_resume_offset(self.path, snapshot.resume_offset,
+                                                 snapshot.resume_key, snapshot.anchor)
+            valid = resume_offset is not None
+        if not valid:
+            snapshot.close()
+            return False
+
+        self._reset()
+        self.snapshot = snapshot
+        self.tail_key = snapshot.tail_key
+        self.resume_offset = resume_offset
+        self.resume_key = snapshot.resume_key
+        self.resume_anchor = snapshot.anchor
+        self.stat = (snapshot.log_size, snapshot.log_mtime_ns)
+        self.load_more(count)
+        self.dirty = False
+        return True
+
+    # Saves the loaded history, its sort keys and where older history resumes
+    # in the log, so the next launch can restore it without parsing anything.
+    # The part of a restored snapshot that hasn't been read yet is carried
+    # over as it is, and records that came from the snapshot keep the bytes
+    # they were decoded from, so only records added since are encoded.
+    # Nothing is written if the history hasn't changed since it was loaded, or
+    # if it can't be tied to a record in the current log (mid-purge, or a log
+    # that isn't in dunst_log.py's layout).
+    def save_snapshot(self, snapshot_path):
+        if not self.dirty or self.purge_filters or self.tail_key is None or self.stat is None:
+            return False
+
+        resume_offset, resume_key, anchor = 0, None, b''
+        if self.reader is not None:
+            resume_offset = self.reader.unread_end()
+            point = resume_point(self.reader.file, resume_offset) if resume_offset else None
+            if resume_offset is None or (resume_offset and point is None):
+                return False
+            if point is not None:
+                resume_key, anchor = point
+        elif self.resume_offset:
+            resume_offset = self._locate_resume_offset()
+            if resume_offset is None:
+                return False
+            resume_key, anchor = self.resume_key, self.resume_anchor
+
+        loaded = [(key, self.encoded.get(id(n)) or json.dumps(n, ensure_ascii=False).encode('utf-8'))
+                  for key, n in zip(self.keys, self.records)]
+        unread_keys, unread_blobs = self.snapshot.unread() if self.snapshot is not None else ([], [])
+        entries = list(heapq.merge(loaded, zip(unread_keys, unread_blobs), key=lambda entry: entry[0]))
+
+        keys = array('d', [key for key, blob in entries])
+        blobs = [blob for key, blob in entries]
+        offsets = array('Q', [0])
+        total = 0
+        for blob in blobs:
+            total += len(blob)
+            offsets.append(total)
+
+        meta = json.dumps({
+            'tail_key': list(self.tail_key),
+            'resume_key': list(resume_key) if resume_key is not None else None,
+            'anchor': anchor.hex(),
+        }).encode('utf-8')
+        meta += b' ' * (-len(meta) % 8)
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, self.stat[0], self.stat[1],
+                                      resume_offset, len(entries), len(meta))
+
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        temp_file = snapshot_path + '.tmp'
+        try:
+            with open(temp_file, 'wb') as f:
+                f.write(header)
+                f.write(meta)
+                f.write(keys.tobytes())
+                f.write(offsets.tobytes())
+                f.write(b''.join(blobs))
+            os.replace(temp_file, snapshot_path)
+        except OSError as e:
+            print(f"Error saving notification snapshot: {e}")
+            if os.path.exists(temp_file):
+                os.unlink(temp_file)
+            return False
+
+        self.dirty = False
+        return True
+
+    # Releases the reader's file handle and any open snapshot.
+    def close(self):
+        if self.reader:
+            self.reader.close()
+            self.reader = None
+        if self.snapshot:
+            self.snapshot.close()
+            self.snapshot = None
+
+    # Reads the next page of older history and adds it to the records. Pages
+    # come from a restored snapshot first, then from the log, resuming at the
+    # record the snapshot was taken at.
+    def load_more(self, count=PAGE_SIZE):
+        if self.snapshot is not None:
+            page, keys, blobs = self.snapshot.read_records(count)
+            if self.snapshot.exhausted():
+                self.snapshot.close()
+                self.snapshot = None
+            if self.purge_filters:
+                kept = [not any(f.matches(n) for f in self.purge_filters) for n in page]
+                page = [n for n, keep in zip(page, kept) if keep]
+                blobs = [blob for blob, keep in zip(blobs, kept) if keep]
+                keys = [sort_key(n) for n in page]
+            for n, blob in zip(page, blobs):
+                self.encoded[id(n)] = blob
+            if page and (not self.keys or keys[0] >= self.keys[-1]):
+                for n in page:
+                    self._index(n)
+                self.records.extend(page)
+                self.keys.extend(keys)
+            else:
+                self.insert(page)
+            return page
+
+        if self.resume_offset:
+            resume_offset = self._locate_resume_offset()
+            if resume_offset is not None:
+                self.reader = LogReverseReader(self.path, end=resume_offset)
+            else:
+                print("Older notification history was rewritten; reopen the history to load it.")
+        self.resume_offset = None
+        if not self.has_more():
+            return []
+
+        page = self.reader.read_records(count)
+        if page and self.tail_key is None:
+            self.tail_key = record_key(page[0])
+        for n in page:
+            self._prepare(n)
+        if self.purge_filters:
+            page = [n for n in page if not any(f.matches(n) for f in self.purge_filters)]
+        self.insert(page)
+        if self.reader.exhausted():
+            self.reader.close()
+            self.reader = None
+        return page
+
+    # Checks the log for notifications written since the last call. Returns the
+    # new records (newest first), or None if the log was rewritten in a way
+    # that doesn't continue the loaded history and the store has to be reopened.
+    def load_new(self):
+        stat = log_stat(self.path)
+        if stat is None:
+            return None if self.records else []
+        if stat == self.stat:
+            return []
+        self.stat = stat
+
+        if self.tail_key is None:
+            return None
+
+        reader = LogReverseReader(self.path)
+        try:
+            new_records = []
+            while True:
+                page = reader.read_records(PAGE_SIZE)
+                if not page:
+                    return None
+                for n in page:
+                    if record_key(n) == self.tail_key:
+                        if new_records:
+                            self.tail_key = record_key(new_records[0])
+                        for record in new_records:
+                            self._prepare(record)
+                        self.insert(reversed(new_records))
+                        return new_records
+                    new_records.append(n)
+                if len(new_records) >= PAGE_SIZE:
+                    return None
+        finally:
+            reader.close()
+
+    # Where older history resumes in the log as it is now, which rotation may
+    # have moved since the snapshot was taken, or None if that record is gone.
+    def _locate_resume_offset(self):
+        resume_offset = locate_resume_offset(self.path, self.resume_offset, self.resume_key, self.resume_anchor)
+        if resume_offset is not None:
+            self.resume_offset = resume_offset
+        return resume_offset
+
+    # Inserts records at their sorted positions. Appending a page of older
+    # history and prepending newly logged notifications are the common cases
+    # and skip the binary search entirely.
+    def insert(self, records):
+        for n in records:
+            self.dirty = True
+            self._index(n)
+            key = sort_key(n)
+            if not self.keys or key >= self.keys[-1]:
+                self.keys.append(key)
+                self.records.append(n)
+            elif key < self.keys[0]:
+                self.keys.insert(0, key)
+                self.records.insert(0, n)
+            else:
+                position = bisect.bisect_right(self.keys, key)
+                self.keys.insert(position, key)
+                self.records.insert(position, n)
+
+    # Drops loaded records matching a purge that has rewritten the log. The
+    # reader still points at the log as it was before the purge, so older
+    # pages are filtered the same way until the store is reopened.
+    def discard(self, purge_filter):
+        removed = [n for n in self.records if purge_filter.matches(n)]
+        if removed:
+            self.records = [n for n in self.records if not purge_filter.matches(n)]
+            self.keys = [sort_key(n) for n in self.records]
+            self.dirty = True
+            for n in removed:
+                self._unindex(n)
+        if self.has_more():
+            self.purge_filters.append(purge_filter)
+        return removed
+
+    # Forgets all loaded history and closes any open reader.
+    def _reset(self):
+        self.close()
+        self.records = []
+        self.keys = []
+        self.tail_key = None
+        self.resume_offset = None
+        self.resume_key = None
+        self.resume_anchor = None
+        self.purge_filters = []
+        self.dirty = True
+        self.by_id = {}
+        self.app_postings = {}
+        self.day_postings = {}
+        self.image_postings = set()
+        self.generation += 1
+        self.search_cache = None
+        self.stats = ActivityStats()
+        self.encoded = {}
+
+    # The number of loaded notifications per app.
+    def app_counts(self):
+        return {app_name: len(ids) for app_name, ids in self.app_postings.items()}
+
+    # The number of loaded notifications in a time facet, from the per-day
+    # postings of at most a week's worth of days.
+    def range_count(self, time_range):
+        if time_range == 'older':
+            return len(self.by_id) - self.range_count('week')
+        return sum(len(self.day_postings.get(day, ())) for day in range_days(time_range))
+
+    # The ids of the loaded notifications in a time facet.
+    def range_ids(self, time_range):
+        if time_range == 'older':
+            return set(self.by_id).difference(self.range_ids('week'))
+        ids = set()
+        for day in range_days(time_range):
+            ids.update(self.day_postings.get(day, ()))
+        return ids
+
+    # The ids matching the selected app and time facets, as the intersection
+    # of their postings, or None if no facet is selected.
+    def facet_ids(self, app_name=None, time_range=None):
+        postings = []
+        if app_name is not None:
+            postings.append(self.app_postings.get(app_name, set()))
+        if time_range is not None:
+            postings.append(self.range_ids(time_range))
+        if not postings:
+            return None
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    # The ids of the loaded notifications whose text contains `search_text`.
+    # Typing usually extends the previous query, so when it does (and nothing
+    # was loaded in between) only the previous matches are checked again.
+    def search_ids(self, search_text):
+        search_lower = search_text.lower()
+        if self.search_cache and self.search_cache[0] == self.generation and search_lower.startswith(self.search_cache[1]):
+            candidates = self.search_cache[2]
+        else:
+            candidates = self.by_id
+
+        ids = set()
+        for i in candidates:
+            n = self.by_id[i]
+            content = (n.get('app_name', '') + ' ' + n.get('summary', '') + ' ' + n.get('body', '')).lower()
+            if search_lower in content:
+                ids.add(i)
+
+        self.search_cache = (self.generation, search_lower, ids)
+        return ids
+
+    # True if the notification's icon is an image saved by the logger.
+    def has_image(self, notification):
+        return bool(self.image_dir) and notification.get('icon', '').startswith(self.image_dir + os.sep)
+
+    # The loaded records with the given ids, in display order.
+    def select(self, ids):
+        if len(ids) * 4 > len(self.records):
+            return [n for n in self.records if id(n) in ids]
+        return sorted((self.by_id[i] for i in ids), key=sort_key)
+
+    # Adds a record to the postings lists.
+    def _index(self, notification):
+        i = id(notification)
+        self.by_id[i] = notification
+        self.app_postings.setdefault(notification.get('app_name', 'System'), set()).add(i)
+        self.day_postings.setdefault(day_of(notification.get('epoch')), set()).add(i)
+        if self.has_image(notification):
+            self.image_postings.add(i)
+        self.stats.add(notification)
+        self.generation += 1
+
+    # Removes a record from the postings lists, dropping lists that run empty.
+    def _unindex(self, notification):
+        i = id(notification)
+        self.by_id.pop(i, None)
+        for postings, key in ((self.app_postings, notification.get('app_name', 'System')),
+                              (self.day_postings, day_of(notification.get('epoch')))):
+            ids = postings.get(key)
+            if ids is not None:
+                ids.discard(i)
+                if not ids:
+                    del postings[key]
+        self.image_postings.discard(i)
+        self.encoded.pop(i, None)
+        self.stats.add(notification, -1)
+        self.generation += 1
+
+    # Annotates a freshly read record with the values the UI needs, so they
+    # are only computed once per record.
+    def _prepare(self, notification):
+        notification['epoch'] = parse_timestamp(notification.get('timestamp', ''))
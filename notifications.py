@@ -1,177 +1,354 @@
 import gi
 gi.require_version('Gtk', '4.0')
 gi.require_version('Adw', '1')
-from gi.repository import Gtk, Adw, GLib, Pango, Gio, Gdk
+from gi.repository import Gtk, Adw, GLib, Pango, Gio, GObject
 import json
 import os
-from datetime import datetime, timezone
+import time
+from datetime import datetime
+import threading
+import bisect
 import warnings
-import subprocess
+from notification_store import (NotificationStore, PurgeFilter, purge_history, remove_snapshot, sort_key,
+                                in_time_range, TIME_RANGES, STATS_HOURS)
+from icon_cache import icon_index, texture_cache, thumbnail_loader, THUMBNAIL_SIZE
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
-# Represents a single, interactive row in the notification list.
-# This class is responsible for displaying the notification's content,
-# handling its visual state (like expanded or collapsed), and loading its icon.
-class NotificationRow(Gtk.ListBoxRow):
-    # Initializes the notification row with its data and sets up its basic properties.
+# How close (in pixels) the user has to scroll to the bottom of the list
+# before the next page of older history is read.
+LOAD_MORE_THRESHOLD = 600
+
+IMAGES_DIR = os.path.expanduser("~/.local/share/dunst/images")
+SNAPSHOT_FILE = os.path.expanduser("~/.cache/dashboard/notifications.snapshot")
+
+# The age-based purge options offered by the clear menu, as (label, days).
+PURGE_AGES = [("Older than a day", 1), ("Older than a week", 7), ("Older than a month", 30)]
+
+# How many apps the statistics panel lists and charts.
+STATS_TOP_APPS = 8
+
+# The labels of the time facet chips, keyed by the store's time ranges.
+TIME_RANGE_LABELS = {'today': "Today", 'week': "This week", 'older': "Older"}
+
+# Formats an epoch timestamp into a human-readable, relative string like
+# "now", "5m ago", "14:30", "yesterday", or "Jan 15", relative to `now`.
+def format_relative_time(epoch, now):
+    if epoch is None: return "unknown"
+
+    seconds = now - epoch
+    if seconds < 60:
+        return "now"
+    elif seconds < 3600:
+        return f"{int(seconds // 60)}m ago"
+
+    days = int(seconds // 86400)
+    if days == 0:
+        return datetime.fromtimestamp(epoch).strftime('%H:%M')
+    elif days == 1:
+        return "yesterday"
+    else:
+        return datetime.fromtimestamp(epoch).strftime('%b %d')
+
+# Determines if a notification's content matches a given search text.
+# This is used for filtering the notification list.
+def matches_search(notification, search_text):
+    if not search_text:
+        return True
+
+    search_lower = search_text.lower()
+    content = (
+        notification.get('app_name', '') + ' ' +
+        notification.get('summary', '') + ' ' +
+        notification.get('body', '')
+    ).lower()
+
+    return search_lower in content
+
+# Buckets notifications (already sorted newest first) by app. Apps come out
+# ordered by their newest notification.
+def group_by_app(notifications):
+    by_app = {}
+    for n in notifications:
+        by_app.setdefault(n.get('app_name', 'System'), []).append(n)
+    return by_app
+
+# The sort key of a list item: its notification's, or for an app group the
+# key of its newest notification.
+def item_key(item):
+    if isinstance(item, NotificationGroup):
+        return item.keys[0]
+    return sort_key(item.notification)
+
+# Orders list items newest first, for Gio.ListStore.insert_sorted().
+def compare_items(a, b, *user_data):
+    key_a, key_b = item_key(a), item_key(b)
+    return (key_a > key_b) - (key_a < key_b)
+
+# A list model item wrapping a single notification record. The expanded state
+# lives here rather than on the row, because the list view recycles row
+# widgets as they scroll in and out of view.
+class NotificationItem(GObject.Object):
     def __init__(self, notification):
         super().__init__()
         self.notification = notification
         self.expanded = False
+        self.row = None
+
+# A list model item for one app in the grouped view. It only keeps the app's
+# notification records (newest first); items for them are created when the
+# group is expanded. Whether it is expanded is remembered here while the group
+# is moved, since its tree row is replaced when it is reinserted.
+class NotificationGroup(GObject.Object):
+    def __init__(self, app_name, notifications):
+        super().__init__()
+        self.app_name = app_name
+        self.notifications = notifications
+        self.keys = [sort_key(n) for n in notifications]
+        self.members_model = None
+        self.expanded = False
+        self.row = None
+
+    # Inserts records at their sorted positions in the group and tells an
+    # expanded group's child model about each of them.
+    def add(self, notifications):
+        for n in notifications:
+            key = sort_key(n)
+            position = bisect.bisect_right(self.keys, key)
+            self.keys.insert(position, key)
+            self.notifications.insert(position, n)
+            if self.members_model:
+                self.members_model.items_changed(position, 0, 1)
+
+# The child model of an expanded app group. It wraps the group's records and
+# only creates list items for the positions the list view actually asks for.
+class GroupMembersModel(GObject.Object, Gio.ListModel):
+    def __init__(self, notifications, get_item):
+        super().__init__()
+        self.notifications = notifications
+        self.get_item = get_item
+
+    def do_get_item_type(self):
+        return NotificationItem.__gtype__
+
+    def do_get_n_items(self):
+        return len(self.notifications)
+
+    def do_get_item(self, position):
+        if position >= len(self.notifications):
+            return None
+        return self.get_item(self.notifications[position])
+
+# Represents a single, interactive row in the notification list.
+# This class is responsible for displaying the notification's content,
+# handling its visual state (like expanded or collapsed), and loading its icon.
+# Rows are recycled by the list view, so the same row is bound to different
+# notifications (or group headers) over its lifetime.
+class NotificationRow(Gtk.Box):
+    # Initializes the row's basic properties. Content is filled in by bind().
+    def __init__(self):
+        super().__init__(orientation=Gtk.Orientation.VERTICAL)
+        self.item = None
+        self.notification = None
+        self.body_text = ""
+        self.body_revealer = None
+        self.clock_minute = None
 
-        self.set_activatable(True)
         self.add_css_class("notification-row")
 
         self.create_ui()
 
-    # Constructs all the visual elements (widgets) that make up the notification row.
-    # This includes the icon, text labels, and the expandable body section.
+    # Constructs the visual elements (widgets) that every row shares: the icon,
+    # text labels, group count and expand icon. The body section is only built
+    # when the row is expanded.
     def create_ui(self):
-        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL)
         header_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=12,
                              margin_top=12, margin_bottom=12, margin_start=16, margin_end=16)
 
         self.avatar = Adw.Avatar(size=48, halign=Gtk.Align.CENTER, valign=Gtk.Align.CENTER)
-        self.load_icon()
 
         content_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4,
                               hexpand=True,
                               valign=Gtk.Align.CENTER)
 
-        app_name_label = Gtk.Label(label=self.notification.get('app_name', 'System'),
-                                   halign=Gtk.Align.START, xalign=0, css_classes=["app-name"])
+        self.app_name_label = Gtk.Label(halign=Gtk.Align.START, xalign=0, css_classes=["app-name"])
+
+        self.summary_label = Gtk.Label(halign=Gtk.Align.START, xalign=0, ellipsize=Pango.EllipsizeMode.END,
+                                       max_width_chars=50, css_classes=["summary-label"])
 
-        summary_label = Gtk.Label(label=self.notification.get('summary', 'No summary'),
-                                  halign=Gtk.Align.START, xalign=0, ellipsize=Pango.EllipsizeMode.END,
-                                  max_width_chars=50, css_classes=["summary-label"])
+        content_box.append(self.app_name_label)
+        content_box.append(self.summary_label)
 
-        content_box.append(app_name_label)
-        content_box.append(summary_label)
+        self.count_label = Gtk.Label(valign=Gtk.Align.CENTER, visible=False, css_classes=["group-count"])
 
-        time_label = Gtk.Label(label=self.format_timestamp(),
-                               valign=Gtk.Align.CENTER,
-                               margin_end=6,
-                               css_classes=["time-label"])
+        self.time_label = Gtk.Label(valign=Gtk.Align.CENTER,
+                                    margin_end=6,
+                                    css_classes=["time-label"])
 
         self.expand_icon = Gtk.Image(icon_name="pan-end-symbolic", css_classes=["expand-icon"], valign=Gtk.Align.CENTER)
 
         header_box.append(self.avatar)
         header_box.append(content_box)
-        header_box.append(time_label)
-
-        body_text = self.notification.get('body', '').strip()
-        if body_text:
-            header_box.append(self.expand_icon)
-
-        main_box.append(header_box)
+        header_box.append(self.count_label)
+        header_box.append(self.time_label)
+        header_box.append(self.expand_icon)
 
-        if body_text:
-            self.body_revealer = Gtk.Revealer(transition_type=Gtk.RevealerTransitionType.SLIDE_DOWN,
-                                              transition_duration=250, reveal_child=False)
-
-            body_container = Gtk.Box(orientation=Gtk.Orientation.VERTICAL,
-                                     margin_start=76, margin_end=16, margin_bottom=16)
+        self.append(header_box)
 
-            body_label = Gtk.Label(label=body_text, halign=Gtk.Align.START, xalign=0,
-                                   wrap=True, wrap_mode=Pango.WrapMode.WORD_CHAR,
-                                   css_classes=["body-label"])
+    # Fills the row in for a list item, which is either a single notification or
+    # an app group header showing the member count and the newest summary.
+    def bind(self, item, now):
+        self.item = item
+        item.row = self
+
+        if isinstance(item, NotificationGroup):
+            self.notification = item.notifications[0]
+            self.body_text = ""
+            self.app_name_label.set_label(item.app_name)
+            self.count_label.set_label(str(len(item.notifications)))
+            self.count_label.set_visible(True)
+        else:
+            self.notification = item.notification
+            self.body_text = self.notification.get('body', '').strip()
+            self.app_name_label.set_label(self.notification.get('app_name', 'System'))
+            self.count_label.set_visible(False)
+            if item.expanded and self.body_text and not self.body_revealer:
+                self.build_body(revealed=True)
+
+        self.expand_icon.set_visible(bool(self.body_text))
+        self.summary_label.set_label(self.notification.get('summary', 'No summary'))
+        self.load_icon()
+        self.refresh_timestamp(now)
+        self.update_expanded_state()
+
+    # Detaches the row from its item before the list view reuses it.
+    def unbind(self):
+        if self.item and self.item.row is self:
+            self.item.row = None
+        self.item = None
+        self.notification = None
+        self.release_body()
+
+    # Builds the expandable body section for the bound notification. This only
+    # happens when the row is first expanded (or bound while expanded), since
+    # nearly all rows are never opened.
+    def build_body(self, revealed=False):
+        body_text = self.body_text
+
+        self.body_revealer = Gtk.Revealer(transition_type=Gtk.RevealerTransitionType.SLIDE_DOWN,
+                                          transition_duration=250, reveal_child=revealed)
+        self.body_revealer.connect("notify::child-revealed", self.on_body_revealed)
+
+        body_container = Gtk.Box(orientation=Gtk.Orientation.VERTICAL,
+                                 margin_start=76, margin_end=16, margin_bottom=16)
+
+        body_label = Gtk.Label(label=body_text, halign=Gtk.Align.START, xalign=0,
+                               wrap=True, wrap_mode=Pango.WrapMode.WORD_CHAR,
+                               css_classes=["body-label"])
+
+        if len(body_text.splitlines()) > 6 or len(body_text) > 400:
+            scrolled_body = Gtk.ScrolledWindow(css_classes=["notification-body-scroll"])
+            scrolled_body.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+            scrolled_body.set_max_content_height(150)
+            scrolled_body.set_child(body_label)
+            body_container.append(scrolled_body)
+        else:
+            body_container.append(body_label)
 
-            if len(body_text.splitlines()) > 6 or len(body_text) > 400:
-                scrolled_body = Gtk.ScrolledWindow(css_classes=["notification-body-scroll"])
-                scrolled_body.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
-                scrolled_body.set_max_content_height(150)
-                scrolled_body.set_child(body_label)
-                body_container.append(scrolled_body)
-            else:
-                body_container.append(body_label)
+        self.body_revealer.set_child(body_container)
+        self.append(self.body_revealer)
 
-            self.body_revealer.set_child(body_container)
-            main_box.append(self.body_revealer)
-        else:
+    # Drops the body section again, so collapsed and recycled rows stay small.
+    def release_body(self):
+        if self.body_revealer:
+            self.remove(self.body_revealer)
             self.body_revealer = None
 
-        self.set_child(main_box)
+    # Releases the body once the collapse animation has finished.
+    def on_body_revealed(self, revealer, pspec):
+        if revealer is self.body_revealer and not revealer.get_child_revealed() and not self.item.expanded:
+            self.release_body()
 
-    # Loads the notification's icon. It first tries to load an image from the provided
-    # path and falls back to displaying the first letter of the app's name if it fails.
+    # Loads the notification's icon. Image paths and themed icon names are both
+    # resolved through the shared icon index and decoded through the shared
+    # texture cache; if neither yields an image, the first letter of the app's
+    # name is shown.
     def load_icon(self):
-        icon_path = self.notification.get('icon', '')
         app_name = self.notification.get('app_name', 'System')
+        icon_path = icon_index.resolve(self.notification.get('icon', ''), app_name)
 
-        if icon_path and os.path.exists(icon_path):
-            try:
-                texture = Gdk.Texture.new_from_filename(icon_path)
-                self.avatar.set_custom_image(texture)
-                return
-            except GLib.Error as e:
-                print(f"GDK texture error for '{icon_path}': {e}, falling back.")
+        texture = texture_cache.get(icon_path) if icon_path else None
+        if texture:
+            self.avatar.set_custom_image(texture)
+            return
 
+        self.avatar.set_custom_image(None)
         self.avatar.set_text(app_name[0].upper() if app_name else "S")
 
-    # Formats the notification timestamp into a human-readable, relative string like
-    # "now", "5m ago", "14:30", "yesterday", or "Jan 15".
-    def format_timestamp(self):
-        ts_str = self.notification.get('timestamp', '')
-        if not ts_str: return "just now"
-
-        try:
-            try:
-                ts = datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
-            except ValueError:
-                ts = datetime.fromisoformat(ts_str)
-
-            if ts.tzinfo is None:
-                ts = ts.astimezone()
-
-            now = datetime.now(ts.tzinfo)
-            diff = now - ts
-
-            seconds = diff.total_seconds()
-            if seconds < 60:
-                return "now"
-            elif seconds < 3600:
-                return f"{int(seconds // 60)}m ago"
-            elif diff.days == 0:
-                return ts.strftime('%H:%M')
-            elif diff.days == 1:
-                return "yesterday"
-            else:
-                return ts.strftime('%b %d')
-        except (ValueError, TypeError) as e:
-            print(f"Could not parse timestamp '{ts_str}': {e}")
-            return "unknown"
+    # Updates the relative time label ("5m ago") against the given time. The
+    # epoch is parsed once when the notification is loaded, so this is cheap
+    # enough to run from the widget's shared clock.
+    def refresh_timestamp(self, now):
+        self.clock_minute = int(now // 60)
+        if not self.notification.get('timestamp'):
+            text = "just now"
+        else:
+            text = format_relative_time(self.notification.get('epoch'), now)
+        if self.time_label.get_label() != text:
+            self.time_label.set_label(text)
 
     # Toggles the visibility of the notification's body content, animating
     # the expansion and collapse.
     def toggle_expanded(self):
-        if not self.body_revealer:
+        if not self.body_text:
             return
 
-        self.expanded = not self.expanded
-        self.body_revealer.set_reveal_child(self.expanded)
+        self.item.expanded = not self.item.expanded
+        if self.item.expanded and not self.body_revealer:
+            self.build_body()
+        if self.body_revealer:
+            self.body_revealer.set_reveal_child(self.item.expanded)
+        self.update_expanded_state()
 
-        if self.expanded:
+    # Syncs the expand icon and CSS state with the bound item.
+    def update_expanded_state(self):
+        if self.body_text and self.item.expanded:
             self.expand_icon.set_from_icon_name("pan-up-symbolic")
             self.add_css_class("expanded")
         else:
             self.expand_icon.set_from_icon_name("pan-end-symbolic")
             self.remove_css_class("expanded")
 
-    # Determines if the notification's content matches a given search text.
-    # This is used for filtering the notification list.
-    def matches_search(self, search_text):
-        if not search_text:
-            return True
-
-        search_lower = search_text.lower()
-        content = (
-            self.notification.get('app_name', '') + ' ' +
-            self.notification.get('summary', '') + ' ' +
-            self.notification.get('body', '')
-        ).lower()
-
-        return search_lower in content
+# A tile of the image gallery. Tiles are recycled by the grid view; the
+# thumbnail is requested when a tile is bound and the request withdrawn when
+# it is unbound, so only the tiles on screen are ever decoded.
+class GalleryTile(Gtk.Box):
+    def __init__(self):
+        super().__init__(css_classes=["gallery-tile"], overflow=Gtk.Overflow.HIDDEN)
+        self.path = None
+
+        self.picture = Gtk.Picture(content_fit=Gtk.ContentFit.COVER, can_shrink=True, hexpand=True,
+                                   width_request=120, height_request=120)
+        self.append(self.picture)
+
+    # Shows a notification's image, decoded at thumbnail size through the
+    # shared texture cache.
+    def bind(self, item):
+        notification = item.notification
+        self.path = notification.get('icon')
+        self.set_tooltip_text(f"{notification.get('app_name', 'System')}: {notification.get('summary', '')}")
+        self.picture.set_paintable(None)
+        thumbnail_loader.request(self.path, THUMBNAIL_SIZE, self.on_thumbnail)
+
+    # Cancels a thumbnail that hasn't been decoded yet.
+    def unbind(self):
+        thumbnail_loader.cancel(self.path, THUMBNAIL_SIZE, self.on_thumbnail)
+        self.path = None
+        self.picture.set_paintable(None)
+
+    # Called with the decoded thumbnail, or None if the image can't be loaded.
+    def on_thumbnail(self, texture):
+        self.picture.set_paintable(texture)
 
 # The main container widget for the entire notifications panel.
 # It manages loading notifications from a file, displaying them in a list,
@@ -183,27 +360,48 @@ class NotificationsWidget(Gtk.Box):
         super().__init__(orientation=Gtk.Orientation.VERTICAL)
 
         self.notifications_file = os.path.expanduser("~/.local/share/dunst/notifications.json")
-        self.all_notifications = []
-        self.notification_rows = []
+        self.store = NotificationStore(self.notifications_file, IMAGES_DIR)
+        self.items_by_id = {}
+        self.groups = {}
+        self.bound_rows = set()
 
         self.file_monitor = None
-        self.last_mtime = 0
+        self.clock_timer_id = None
+        self.load_more_id = None
+        self.purge_thread = None
+
+        self.selected_app = None
+        self.selected_range = None
+        self.time_chips = {}
+        self.app_chips = {}
+        self.updating_facets = False
+        self.facet_day = None
 
         self.is_active = False
 
+        icon_index.connect_ready(self.on_icon_index_ready)
+
         self.create_ui()
 
     # Starts the widget's operations, like loading data for the first time
-    # and beginning to monitor the data file for changes.
+    # and beginning to monitor the data file for changes. On a fresh launch the
+    # history saved by the previous one is restored first, so only what the
+    # logger wrote in between has to be parsed.
     def activate(self):
         if self.is_active: return
         self.is_active = True
         print("NotificationsWidget Activated")
+        icon_index.ensure()
+        if not self.store.records and self.store.restore_snapshot(SNAPSHOT_FILE):
+            self.filter_notifications()
         self.reload_notifications()
         self.setup_file_monitor()
+        self.refresh_visible_timestamps()
+        self.schedule_clock_tick()
 
     # Stops the widget's background activities, such as the file monitor,
-    # to conserve resources when it is not visible.
+    # to conserve resources when it is not visible, and saves the loaded
+    # history for the next launch.
     def deactivate(self):
         if not self.is_active: return
         self.is_active = False
@@ -211,6 +409,13 @@ class NotificationsWidget(Gtk.Box):
         if self.file_monitor:
             self.file_monitor.cancel()
             self.file_monitor = None
+        if self.clock_timer_id:
+            GLib.source_remove(self.clock_timer_id)
+            self.clock_timer_id = None
+        if self.load_more_id:
+            GLib.source_remove(self.load_more_id)
+            self.load_more_id = None
+        self.store.save_snapshot(SNAPSHOT_FILE)
 
     # Builds the user interface for the notifications panel, including the
     # header, search bar, clear button, and the scrollable list.
@@ -224,22 +429,411 @@ class NotificationsWidget(Gtk.Box):
         self.search_entry.connect("search-changed", self.on_search_changed)
         header_box.append(self.search_entry)
 
-        clear_button = Gtk.Button(icon_name="edit-clear-all-symbolic", tooltip_text="Clear History", css_classes=["circular"])
-        clear_button.connect("clicked", self.on_clear_clicked)
-        header_box.append(clear_button)
+        self.group_button = Gtk.ToggleButton(icon_name="view-list-symbolic", tooltip_text="Group by App", css_classes=["circular"])
+        self.group_button.connect("toggled", lambda b: self.filter_notifications())
+        header_box.append(self.group_button)
+
+        self.stats_button = Gtk.ToggleButton(icon_name="utilities-system-monitor-symbolic", tooltip_text="Statistics",
+                                             css_classes=["circular"])
+        self.stats_button.connect("toggled", self.on_view_toggled)
+        header_box.append(self.stats_button)
+
+        self.gallery_button = Gtk.ToggleButton(icon_name="view-grid-symbolic", tooltip_text="Image Gallery",
+                                               css_classes=["circular"])
+        self.gallery_button.connect("toggled", self.on_view_toggled)
+        header_box.append(self.gallery_button)
+
+        self.clear_button = Gtk.MenuButton(icon_name="edit-clear-all-symbolic", tooltip_text="Clear History",
+                                           css_classes=["circular"], popover=self.create_clear_popover())
+        header_box.append(self.clear_button)
+
+        # Filter chips for the time ranges and for every app in the history,
+        # each showing how many loaded notifications it would leave.
+        self.time_chips_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        for time_range in TIME_RANGES:
+            self.time_chips[time_range] = self.create_facet_chip(TIME_RANGE_LABELS[time_range], 'range', time_range)
+            self.time_chips_box.append(self.time_chips[time_range][0])
+
+        self.app_chips_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        facets_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        facets_box.append(self.time_chips_box)
+        facets_box.append(Gtk.Separator(orientation=Gtk.Orientation.VERTICAL, margin_start=4, margin_end=4))
+        facets_box.append(self.app_chips_box)
+
+        facets_scroll = Gtk.ScrolledWindow(css_classes=["invisible-scroll"], margin_start=20, margin_end=20, margin_bottom=12)
+        facets_scroll.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.NEVER)
+        facets_scroll.set_child(facets_box)
+
+        self.purge_progress = Gtk.ProgressBar(show_text=True, margin_start=20, margin_end=20, margin_bottom=12)
+        self.purge_revealer = Gtk.Revealer(transition_type=Gtk.RevealerTransitionType.SLIDE_DOWN,
+                                           reveal_child=False)
+        self.purge_revealer.set_child(self.purge_progress)
 
         scrolled_area = Gtk.ScrolledWindow(vexpand=True, css_classes=["invisible-scroll"])
         scrolled_area.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
 
-        self.listbox = Gtk.ListBox(selection_mode=Gtk.SelectionMode.NONE,
-                                   css_classes=["notifications-list"],
-                                   margin_start=16, margin_end=16, margin_bottom=16)
-        self.listbox.connect("row-activated", lambda lb, row: row.toggle_expanded())
-
-        scrolled_area.set_child(self.listbox)
+        # The root store holds either notifications or app groups. Group members
+        # only become list items once their group is expanded.
+        self.root_store = Gio.ListStore.new(GObject.Object)
+        self.tree_model = Gtk.TreeListModel.new(self.root_store, False, False, self.create_group_model)
+
+        factory = Gtk.SignalListItemFactory()
+        factory.connect("setup", self.on_row_setup)
+        factory.connect("bind", self.on_row_bind)
+        factory.connect("unbind", self.on_row_unbind)
+
+        self.list_view = Gtk.ListView(model=Gtk.NoSelection(model=self.tree_model), factory=factory,
+                                      single_click_activate=True,
+                                      css_classes=["notifications-list"],
+                                      margin_start=16, margin_end=16, margin_bottom=16)
+        self.list_view.connect("activate", self.on_row_activated)
+
+        scrolled_area.set_child(self.list_view)
+        vadjustment = scrolled_area.get_vadjustment()
+        vadjustment.connect("value-changed", self.check_scroll_position, "list")
+        vadjustment.connect("changed", self.check_scroll_position, "list")
+
+        # The gallery shows the images of the notifications matching the
+        # current search and facets. It pages in older history as it scrolls,
+        # just like the list.
+        self.gallery_store = Gio.ListStore.new(NotificationItem)
+
+        gallery_factory = Gtk.SignalListItemFactory()
+        gallery_factory.connect("setup", lambda f, list_item: list_item.set_child(GalleryTile()))
+        gallery_factory.connect("bind", lambda f, list_item: list_item.get_child().bind(list_item.get_item()))
+        gallery_factory.connect("unbind", lambda f, list_item: list_item.get_child().unbind())
+
+        gallery_grid = Gtk.GridView(model=Gtk.NoSelection(model=self.gallery_store), factory=gallery_factory,
+                                    min_columns=2, max_columns=4, single_click_activate=True,
+                                    css_classes=["gallery-grid"], margin_start=16, margin_end=16, margin_bottom=16)
+        gallery_grid.connect("activate", self.on_gallery_activated)
+
+        gallery_scroll = Gtk.ScrolledWindow(vexpand=True, css_classes=["invisible-scroll"])
+        gallery_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        gallery_scroll.set_child(gallery_grid)
+        vadjustment = gallery_scroll.get_vadjustment()
+        vadjustment.connect("value-changed", self.check_scroll_position, "gallery")
+        vadjustment.connect("changed", self.check_scroll_position, "gallery")
+
+        self.placeholder_label = Gtk.Label(css_classes=["dim-label"], valign=Gtk.Align.START,
+                                           margin_top=50, margin_bottom=50)
+
+        self.list_stack = Gtk.Stack(vexpand=True)
+        self.list_stack.add_named(scrolled_area, "list")
+        self.list_stack.add_named(gallery_scroll, "gallery")
+        self.list_stack.add_named(self.placeholder_label, "placeholder")
+        self.list_stack.add_named(self.create_stats_page(), "stats")
 
         self.append(header_box)
-        self.append(scrolled_area)
+        self.append(facets_scroll)
+        self.append(self.purge_revealer)
+        self.append(self.list_stack)
+
+    # Switches between the list, the statistics page and the gallery. Only one
+    # of the view buttons can be active at a time.
+    def on_view_toggled(self, button):
+        if button.get_active():
+            other = self.stats_button if button is self.gallery_button else self.gallery_button
+            other.set_active(False)
+            if button is self.gallery_button:
+                self.refresh_gallery()
+        self.update_placeholder()
+
+    # Opens a gallery image in the default image viewer.
+    def on_gallery_activated(self, grid_view, position):
+        path = self.gallery_store.get_item(position).notification.get('icon')
+        try:
+            Gio.AppInfo.launch_default_for_uri(GLib.filename_to_uri(path, None), None)
+        except GLib.Error as e:
+            print(f"Failed to open image '{path}': {e}")
+
+    # Builds the statistics page: top senders, the noisiest hours of the day,
+    # and an hourly activity chart per app over the last week.
+    def create_stats_page(self):
+        stats_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=8,
+                            margin_start=20, margin_end=20, margin_bottom=16)
+
+        stats_box.append(Gtk.Label(label="Top senders (7 days)", halign=Gtk.Align.START, css_classes=["stats-heading"]))
+        self.top_senders_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=4)
+        stats_box.append(self.top_senders_box)
+
+        stats_box.append(Gtk.Label(label="Noisiest hours", halign=Gtk.Align.START, css_classes=["stats-heading"]))
+        self.noisy_hours_label = Gtk.Label(halign=Gtk.Align.START, css_classes=["dim-label"])
+        stats_box.append(self.noisy_hours_label)
+        self.hours_chart = Gtk.DrawingArea(content_height=80, hexpand=True)
+        self.hours_chart.set_draw_func(self.draw_hours_chart)
+        stats_box.append(self.hours_chart)
+
+        stats_box.append(Gtk.Label(label="Hourly activity", halign=Gtk.Align.START, css_classes=["stats-heading"]))
+        self.activity_chart = Gtk.DrawingArea(hexpand=True)
+        self.activity_chart.set_draw_func(self.draw_activity_chart)
+        stats_box.append(self.activity_chart)
+
+        self.hour_totals = [0] * 24
+        self.activity_rows = []
+
+        stats_scroll = Gtk.ScrolledWindow(vexpand=True, css_classes=["invisible-scroll"])
+        stats_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        stats_scroll.set_child(stats_box)
+        return stats_scroll
+
+    # Refreshes the statistics page from the store's rolling counts. If the
+    # loaded history doesn't reach back a full week yet, the next older page
+    # is queued; its records update the counts as they are inserted.
+    def update_stats_panel(self):
+        stats = self.store.stats
+        stats.advance()
+        if not self.store.covers(time.time() - STATS_HOURS * 3600):
+            self.schedule_load_more()
+
+        child = self.top_senders_box.get_first_child()
+        while child:
+            self.top_senders_box.remove(child)
+            child = self.top_senders_box.get_first_child()
+
+        top_senders = stats.top_senders(STATS_TOP_APPS)
+        busiest = top_senders[0][1] if top_senders else 1
+        for app_name, count in top_senders:
+            sender_row = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=8)
+            sender_row.append(Gtk.Label(label=app_name, width_chars=14, xalign=0,
+                                        ellipsize=Pango.EllipsizeMode.END, css_classes=["app-name"]))
+            sender_row.append(Gtk.LevelBar(min_value=0, max_value=busiest, value=count,
+                                           hexpand=True, valign=Gtk.Align.CENTER))
+            sender_row.append(Gtk.Label(label=str(count), width_chars=5, xalign=1, css_classes=["time-label"]))
+            self.top_senders_box.append(sender_row)
+        if not top_senders:
+            self.top_senders_box.append(Gtk.Label(label="No notifications in the last 7 days.",
+                                                  halign=Gtk.Align.START, css_classes=["dim-label"]))
+
+        self.hour_totals = stats.hour_of_day_totals()
+        noisiest = sorted((h for h in range(24) if self.hour_totals[h]), key=lambda h: -self.hour_totals[h])[:3]
+        self.noisy_hours_label.set_label(", ".join(f"{h:02d}:00 ({self.hour_totals[h]})" for h in noisiest) or "-")
+        self.hours_chart.queue_draw()
+
+        self.activity_rows = [(app_name, stats.app_series(app_name)) for app_name, count in top_senders]
+        self.activity_chart.set_content_height(len(self.activity_rows) * 16)
+        self.activity_chart.queue_draw()
+
+    # Draws the notification count per hour of the day as a bar chart.
+    def draw_hours_chart(self, area, cr, width, height, user_data=None):
+        peak = max(self.hour_totals) or 1
+        bar_width = width / 24
+        for hour, total in enumerate(self.hour_totals):
+            bar_height = (height - 12) * total / peak
+            cr.set_source_rgba(1, 1, 1, 0.1)
+            cr.rectangle(hour * bar_width + 1, 0, bar_width - 2, height - 12)
+            cr.fill()
+            cr.set_source_rgba(0.31, 0.63, 1, 0.8)
+            cr.rectangle(hour * bar_width + 1, height - 12 - bar_height, bar_width - 2, bar_height)
+            cr.fill()
+            if hour % 6 == 0:
+                cr.set_source_rgba(1, 1, 1, 0.6)
+                cr.set_font_size(9)
+                cr.move_to(hour * bar_width + 1, height - 2)
+                cr.show_text(f"{hour:02d}")
+
+    # Draws one row per top sender with a cell for every hour of the last
+    # week, shaded by how many notifications the app sent in that hour.
+    def draw_activity_chart(self, area, cr, width, height, user_data=None):
+        peak = max((max(series) for app_name, series in self.activity_rows), default=0) or 1
+        cell_width = width / STATS_HOURS
+        for row, (app_name, series) in enumerate(self.activity_rows):
+            for column, count in enumerate(series):
+                cr.set_source_rgba(0.31, 0.63, 1, 0.08 + 0.92 * count / peak if count else 0.04)
+                cr.rectangle(column * cell_width, row * 16 + 1, max(cell_width, 1), 14)
+                cr.fill()
+
+    # Creates a toggleable filter chip with a label and a live count. Returns
+    # the button and the count label.
+    def create_facet_chip(self, label, facet, value):
+        chip_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        chip_box.append(Gtk.Label(label=label))
+        count_label = Gtk.Label(label="0", css_classes=["facet-count"])
+        chip_box.append(count_label)
+
+        button = Gtk.ToggleButton(child=chip_box, css_classes=["facet-chip"])
+        button.connect("toggled", self.on_facet_toggled, facet, value)
+        return button, count_label
+
+    # Refreshes the chip counts from the store's postings, adding chips for new
+    # apps and dropping chips for apps no longer in the history.
+    def update_facets(self):
+        self.facet_day = datetime.now().date()
+        for time_range, (button, count_label) in self.time_chips.items():
+            count_label.set_label(str(self.store.range_count(time_range)))
+
+        app_counts = self.store.app_counts()
+        if set(app_counts) != set(self.app_chips):
+            child = self.app_chips_box.get_first_child()
+            while child:
+                self.app_chips_box.remove(child)
+                child = self.app_chips_box.get_first_child()
+            self.app_chips = {}
+            self.updating_facets = True
+            for app_name in sorted(app_counts, key=lambda a: -app_counts[a]):
+                self.app_chips[app_name] = self.create_facet_chip(app_name, 'app', app_name)
+                self.app_chips[app_name][0].set_active(app_name == self.selected_app)
+                self.app_chips_box.append(self.app_chips[app_name][0])
+            self.updating_facets = False
+
+        for app_name, (button, count_label) in self.app_chips.items():
+            count_label.set_label(str(app_counts[app_name]))
+
+    # Selects or clears a facet. Only one chip per facet can be active, so
+    # turning one on turns the others in its row off.
+    def on_facet_toggled(self, button, facet, value):
+        if self.updating_facets: return
+        chips = self.time_chips if facet == 'range' else self.app_chips
+        selected = value if button.get_active() else None
+        if facet == 'range':
+            if selected is None and self.selected_range != value: return
+            self.selected_range = selected
+        else:
+            if selected is None and self.selected_app != value: return
+            self.selected_app = selected
+
+        self.updating_facets = True
+        for other_value, (other_button, count_label) in chips.items():
+            if other_value != value:
+                other_button.set_active(False)
+        self.updating_facets = False
+        self.filter_notifications()
+
+    # True if a notification lies within the selected app and time facets.
+    def matches_facets(self, notification):
+        if self.selected_app is not None and notification.get('app_name', 'System') != self.selected_app:
+            return False
+        return self.selected_range is None or in_time_range(notification, self.selected_range)
+
+    # Builds the clear menu: clear everything, clear by age, or clear a single
+    # app. The app section is filled in each time the menu opens.
+    def create_clear_popover(self):
+        popover = Gtk.Popover()
+        menu_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+
+        clear_all = Gtk.Button(label="Clear everything", css_classes=["flat"])
+        clear_all.connect("clicked", lambda b: self.start_purge(PurgeFilter(), "Clearing history"))
+        menu_box.append(clear_all)
+
+        for label, days in PURGE_AGES:
+            button = Gtk.Button(label=label, css_classes=["flat"])
+            button.connect("clicked", lambda b, d=days: self.start_purge(
+                PurgeFilter(older_than=time.time() - d * 86400), "Clearing old notifications"))
+            menu_box.append(button)
+
+        menu_box.append(Gtk.Separator(margin_top=4, margin_bottom=4))
+        self.purge_apps_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=2)
+        menu_box.append(self.purge_apps_box)
+
+        popover.set_child(menu_box)
+        popover.connect("show", lambda p: self.update_purge_apps())
+        return popover
+
+    # Lists a "Clear <app>" entry for every app in the loaded history.
+    def update_purge_apps(self):
+        child = self.purge_apps_box.get_first_child()
+        while child:
+            self.purge_apps_box.remove(child)
+            child = self.purge_apps_box.get_first_child()
+
+        for app_name in group_by_app(self.store.records):
+            button = Gtk.Button(label=f"Clear {app_name}", css_classes=["flat"])
+            button.connect("clicked", lambda b, a=app_name: self.start_purge(
+                PurgeFilter(app_name=a), f"Clearing {a}"))
+            self.purge_apps_box.append(button)
+
+    # Creates a row widget for the list view. The expander indents group
+    # members and shows the arrow on group headers.
+    def on_row_setup(self, factory, list_item):
+        expander = Gtk.TreeExpander()
+        if hasattr(expander, 'set_indent_for_icon'):
+            expander.set_indent_for_icon(False)
+        expander.set_child(NotificationRow())
+        list_item.set_child(expander)
+
+    # Binds a recycled row widget to the item scrolled into its position.
+    def on_row_bind(self, factory, list_item):
+        tree_row = list_item.get_item()
+        expander = list_item.get_child()
+        expander.set_list_row(tree_row)
+
+        row = expander.get_child()
+        row.bind(tree_row.get_item(), time.time())
+        self.bound_rows.add(row)
+
+    # Releases a row widget when its item scrolls out of view.
+    def on_row_unbind(self, factory, list_item):
+        expander = list_item.get_child()
+        row = expander.get_child()
+        row.unbind()
+        self.bound_rows.discard(row)
+        expander.set_list_row(None)
+
+    # Expands or collapses a group header, or a single notification's body.
+    def on_row_activated(self, list_view, position):
+        tree_row = self.tree_model.get_row(position)
+        if not tree_row: return
+
+        item = tree_row.get_item()
+        if isinstance(item, NotificationGroup):
+            tree_row.set_expanded(not tree_row.get_expanded())
+        elif item.row:
+            item.row.toggle_expanded()
+
+    # Called by the tree model for a group's children. Plain notifications have
+    # no children, and members are only turned into items once scrolled to.
+    def create_group_model(self, item):
+        if not isinstance(item, NotificationGroup):
+            return None
+
+        if item.members_model is None:
+            item.members_model = GroupMembersModel(item.notifications, self.get_item)
+        return item.members_model
+
+    # Returns the list item for a notification record, creating it on first use.
+    def get_item(self, notification):
+        item = self.items_by_id.get(id(notification))
+        if item is None:
+            item = NotificationItem(notification)
+            self.items_by_id[id(notification)] = item
+        return item
+
+    # Reloads the icons of the rows on screen once the icon theme has been
+    # indexed, so themed icon names replace the letter fallback.
+    def on_icon_index_ready(self):
+        for row in self.bound_rows:
+            row.load_icon()
+
+    # Arms a one-shot timer for the next minute boundary, which is the finest
+    # granularity the relative time labels show.
+    def schedule_clock_tick(self):
+        if self.clock_timer_id: return
+        delay_ms = int((60 - time.time() % 60) * 1000) + 50
+        self.clock_timer_id = GLib.timeout_add(delay_ms, self.on_clock_tick)
+
+    # Called once a minute by the shared clock. It refreshes the labels of the
+    # rows on screen and re-arms itself for the next minute boundary.
+    def on_clock_tick(self):
+        self.clock_timer_id = None
+        if not self.is_active: return GLib.SOURCE_REMOVE
+        self.refresh_visible_timestamps()
+        if self.facet_day != datetime.now().date():
+            if self.selected_range: self.filter_notifications()
+            else: self.update_facets()
+        if self.stats_button.get_active():
+            self.update_stats_panel()
+        self.schedule_clock_tick()
+        return GLib.SOURCE_REMOVE
+
+    # Refreshes the time labels of the rows currently bound by the list view,
+    # which only keeps rows for what is on screen. Rows whose label is already
+    # up to date for this minute are skipped.
+    def refresh_visible_timestamps(self):
+        now = time.time()
+        minute = int(now // 60)
+        for row in self.bound_rows:
+            if row.clock_minute != minute:
+                row.refresh_timestamp(now)
 
     # Sets up a monitor that watches the notifications JSON file for changes,
     # triggering an automatic reload when the file is modified.
@@ -259,82 +853,262 @@ class NotificationsWidget(Gtk.Box):
         except Exception as e:
             print(f"Failed to set up file monitor: {e}")
 
-    # Reads the notification data from the JSON file, sorts them by date,
-    # and updates the listbox with the new content.
+    # Picks up notifications the logger has written since the last check. If
+    # the log no longer continues the loaded history (it was cleared or
+    # rotated past it), the newest page is read again from scratch.
     def reload_notifications(self):
         if not self.is_active: return GLib.SOURCE_REMOVE
 
-        try:
-            if not os.path.exists(self.notifications_file):
-                self.all_notifications = []
-                self.last_mtime = 0
-            else:
-                current_mtime = os.path.getmtime(self.notifications_file)
-                if current_mtime == self.last_mtime:
-                    return GLib.SOURCE_REMOVE
-
-                self.last_mtime = current_mtime
-                with open(self.notifications_file, 'r') as f:
-                    content = f.read()
-                    self.all_notifications = json.loads(content) if content else []
-
-            self.all_notifications.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-            self.notification_rows = [NotificationRow(n) for n in self.all_notifications]
-            self.filter_notifications()
+        new_records = self.store.load_new()
+        if new_records is None:
+            self.open_history()
+        elif new_records:
+            self.show_records(new_records)
+        else:
+            self.update_placeholder()
 
-        except (json.JSONDecodeError, FileNotFoundError) as e:
-            print(f"Error reading notifications file: {e}")
-            self.all_notifications = []
-            self.notification_rows = []
-            self.filter_notifications()
+        return GLib.SOURCE_REMOVE
+
+    # Drops the loaded history and reads only the newest page of the log, so
+    # opening the tab costs the same no matter how much history is kept.
+    def open_history(self):
+        self.items_by_id.clear()
+        self.store.open()
+        self.filter_notifications()
+
+    # Loads older history once the user scrolls close to the bottom of the
+    # list or the gallery, whichever is showing.
+    def check_scroll_position(self, adjustment, page):
+        if self.list_stack.get_visible_child_name() != page: return
+        remaining = adjustment.get_upper() - adjustment.get_value() - adjustment.get_page_size()
+        if remaining < LOAD_MORE_THRESHOLD:
+            self.schedule_load_more()
+
+    # Queues reading the next page of older history from an idle callback,
+    # so it never runs inside a scroll or layout signal.
+    def schedule_load_more(self):
+        if self.load_more_id or not self.is_active or not self.store.has_more():
+            return
+        self.load_more_id = GLib.idle_add(self.load_older_page)
 
+    # Reads one page of older history and appends it to the list.
+    def load_older_page(self):
+        self.load_more_id = None
+        if not self.is_active: return GLib.SOURCE_REMOVE
+
+        page = self.store.load_more()
+        self.show_records(page)
         return GLib.SOURCE_REMOVE
 
+    # Adds records to the list without rebuilding it, each at its sorted
+    # position. Only records matching the search and the facets are shown.
+    def show_records(self, records):
+        search_text = self.search_entry.get_text().strip()
+        matching = sorted((n for n in records if self.matches_facets(n) and matches_search(n, search_text)),
+                          key=sort_key)
+
+        if not matching:
+            pass
+        elif self.group_button.get_active():
+            self.add_to_groups(matching)
+        else:
+            self.insert_items([self.get_item(n) for n in matching])
+
+        images = [n for n in matching if self.store.has_image(n)]
+        if images and self.gallery_button.get_active():
+            self.insert_items([self.get_item(n) for n in images], self.gallery_store)
+
+        self.update_facets()
+        self.update_placeholder()
+
+    # Inserts items (sorted newest first) into the root store, or the given
+    # one. A batch that lies entirely above or below the current items is
+    # spliced in one go, which covers new notifications and older pages;
+    # anything else (history that was logged out of order) is placed with a
+    # binary search.
+    def insert_items(self, items, list_store=None):
+        list_store = list_store or self.root_store
+        count = list_store.get_n_items()
+        if not count or item_key(items[0]) >= item_key(list_store.get_item(count - 1)):
+            list_store.splice(count, 0, items)
+        elif item_key(items[-1]) < item_key(list_store.get_item(0)):
+            list_store.splice(0, 0, items)
+        else:
+            for item in items:
+                list_store.insert_sorted(item, compare_items)
+
+    # Merges records into the app groups, creating groups for new apps. A group
+    # whose newest notification changes is moved to its new position, and
+    # expanded again there if it was expanded.
+    def add_to_groups(self, notifications):
+        now = time.time()
+        for app_name, members in group_by_app(notifications).items():
+            group = self.groups.get(app_name)
+            if group is None:
+                group = NotificationGroup(app_name, members)
+                self.groups[app_name] = group
+                self.insert_items([group])
+                continue
+
+            newest_key = group.keys[0]
+            group.add(members)
+            if group.keys[0] != newest_key:
+                found, position = self.root_store.find(group)
+                if found:
+                    tree_row = self.tree_model.get_child_row(position)
+                    group.expanded = bool(tree_row and tree_row.get_expanded())
+                    self.root_store.remove(position)
+                self.insert_items([group])
+                if group.expanded:
+                    found, position = self.root_store.find(group)
+                    tree_row = self.tree_model.get_child_row(position) if found else None
+                    if tree_row:
+                        tree_row.set_expanded(True)
+            elif group.row:
+                group.row.bind(group, now)
+
     # Callback function that is triggered when the text in the search entry changes.
     def on_search_changed(self, search_entry):
         self.filter_notifications()
 
-    # Clears and repopulates the listbox based on the current search text,
-    # showing only the notifications that match the query.
+    # Repopulates the list based on the current search text and facets,
+    # showing only the loaded notifications that match, either flat or grouped
+    # by app. The matches are the intersection of the facets' postings and the
+    # ids matching the search.
     def filter_notifications(self):
+        ids = self.matching_ids()
+        matching = self.store.records if ids is None else self.store.select(ids)
+        if self.group_button.get_active():
+            self.groups = {app_name: NotificationGroup(app_name, members)
+                           for app_name, members in group_by_app(matching).items()}
+            items = list(self.groups.values())
+        else:
+            self.groups = {}
+            items = [self.get_item(n) for n in matching]
+
+        self.root_store.splice(0, self.root_store.get_n_items(), items)
+        if self.gallery_button.get_active():
+            self.refresh_gallery(ids)
+        self.update_facets()
+        self.update_placeholder()
+
+    # The ids of the loaded notifications matching the search text and the
+    # selected facets, or None if nothing narrows the history down.
+    def matching_ids(self):
         search_text = self.search_entry.get_text().strip()
-
-        for child in list(self.listbox):
-             self.listbox.remove(child)
-
-        if not self.notification_rows:
+        ids = self.store.facet_ids(self.selected_app, self.selected_range)
+        if search_text:
+            search_ids = self.store.search_ids(search_text)
+            ids = search_ids if ids is None else ids & search_ids
+        return ids
+
+    # Repopulates the gallery with the images of the matching notifications.
+    def refresh_gallery(self, ids=None):
+        ids = self.matching_ids() if ids is None else ids
+        image_ids = self.store.image_postings if ids is None else self.store.image_postings & ids
+        items = [self.get_item(n) for n in self.store.select(image_ids)]
+        self.gallery_store.splice(0, self.gallery_store.get_n_items(), items)
+
+    # Shows the list, the gallery, the statistics page, or a placeholder when
+    # there is nothing to show. While a search has no results yet but older
+    # history is left, the next page is read right away instead of waiting
+    # for a scroll.
+    def update_placeholder(self):
+        gallery = self.gallery_button.get_active()
+        if self.stats_button.get_active():
+            self.update_stats_panel()
+            self.list_stack.set_visible_child_name("stats")
+        elif (self.gallery_store if gallery else self.root_store).get_n_items():
+            self.list_stack.set_visible_child_name("gallery" if gallery else "list")
+        elif self.store.has_more():
+            self.show_placeholder("Searching older notifications...")
+            self.schedule_load_more()
+        elif not self.store.records:
             self.show_placeholder("No notifications yet.")
-            return
-
-        filtered_count = 0
-        for row in self.notification_rows:
-            if row.matches_search(search_text):
-                self.listbox.append(row)
-                filtered_count += 1
-
-        if filtered_count == 0:
-            self.show_placeholder(f"No results for '{search_text}'")
+        elif self.search_entry.get_text().strip():
+            self.show_placeholder(f"No results for '{self.search_entry.get_text().strip()}'")
+        elif gallery:
+            self.show_placeholder("No images to show.")
+        else:
+            self.show_placeholder("No notifications match the selected filters.")
 
-    # Displays a placeholder message in the list area, used when there are
+    # Displays a placeholder message in place of the list, used when there are
     # no notifications or no search results to display.
     def show_placeholder(self, text):
-        placeholder = Gtk.Label(label=text, css_classes=["dim-label"],
-                                margin_top=50, margin_bottom=50)
-        self.listbox.append(placeholder)
-
-    # Handles the click event for the 'Clear History' button, deleting the
-    # contents of the notifications file and any cached images.
-    def on_clear_clicked(self, button):
+        self.placeholder_label.set_label(text)
+        self.list_stack.set_visible_child_name("placeholder")
+
+    # Starts a purge on a worker thread. Rewriting the log and deleting tens of
+    # thousands of images both happen off the main loop; the list is updated
+    # as soon as the log is rewritten and a progress bar tracks the images.
+    def start_purge(self, purge_filter, description):
+        self.clear_button.popdown()
+        if self.purge_thread: return
+
+        self.clear_button.set_sensitive(False)
+        self.purge_progress.set_fraction(0)
+        self.purge_progress.set_text(description)
+        self.purge_revealer.set_reveal_child(True)
+
+        self.purge_thread = threading.Thread(target=self._purge_worker, args=(purge_filter,), daemon=True)
+        self.purge_thread.start()
+
+    # Runs in the background thread and hands every update back to the main thread.
+    def _purge_worker(self, purge_filter):
         try:
-            with open(self.notifications_file, 'w') as f:
-                json.dump([], f)
+            removed, images = purge_history(
+                self.notifications_file, IMAGES_DIR, purge_filter,
+                on_log_written=lambda count: GLib.idle_add(self.on_purge_log_written, purge_filter),
+                progress=lambda done, total: GLib.idle_add(self.on_purge_progress, done, total))
+            print(f"Purged {removed} notifications and {images} images.")
+        except Exception as e:
+            print(f"Error clearing notifications: {e}")
+        GLib.idle_add(self.on_purge_finished)
+
+    # Drops the purged notifications from the loaded history and the list,
+    # without rereading the log. The saved snapshot still holds them, so it is
+    # deleted; the next deactivate() writes a fresh one once it can.
+    def on_purge_log_written(self, purge_filter):
+        self.store.discard(purge_filter)
+        remove_snapshot(SNAPSHOT_FILE)
+        if self.selected_app is not None and self.selected_app not in self.store.app_postings:
+            self.selected_app = None
+            self.filter_notifications()
+            return GLib.SOURCE_REMOVE
 
-            images_dir = os.path.expanduser("~/.local/share/dunst/images")
-            if os.path.exists(images_dir):
-                subprocess.run(['rm', '-rf', f'{images_dir}/*'], shell=True, check=False)
+        if self.group_button.get_active():
+            self.filter_notifications()
+            return GLib.SOURCE_REMOVE
+
+        if self.gallery_button.get_active():
+            self.refresh_gallery()
+
+        # Remove runs of purged items from the end, one splice per run.
+        run_end = None
+        for position in range(self.root_store.get_n_items() - 1, -1, -1):
+            if purge_filter.matches(self.root_store.get_item(position).notification):
+                if run_end is None:
+                    run_end = position + 1
+            elif run_end is not None:
+                self.root_store.splice(position + 1, run_end - position - 1, [])
+                run_end = None
+        if run_end is not None:
+            self.root_store.splice(0, run_end, [])
+
+        self.update_facets()
+        self.update_placeholder()
+        return GLib.SOURCE_REMOVE
 
-            self.search_entry.set_text("")
-            print("Notification history cleared.")
+    # Shows how many of the purged notifications' images have been deleted.
+    def on_purge_progress(self, done, total):
+        self.purge_progress.set_fraction(done / total if total else 1.0)
+        self.purge_progress.set_text(f"Deleting images {done}/{total}")
+        return GLib.SOURCE_REMOVE
 
-        except Exception as e:
-            print(f"Error clearing notifications: {e}")
\ No newline at end of file
+    # Hides the progress bar and re-enables the clear menu.
+    def on_purge_finished(self):
+        self.purge_thread = None
+        self.purge_revealer.set_reveal_child(False)
+        self.clear_button.set_sensitive(True)
+        print("Notification history cleared.")
+        return GLib.SOURCE_REMOVE